@@ -0,0 +1,150 @@
+"""
+Exact, mergeable aggregates behind the counting and average panels and the hour-of-week
+heatmap. Built from a hot partition with SQL or from an archived Parquet frame, and
+summed across partitions and cab types, so every variant comes out of one pass over the data.
+"""
+from collections import Counter
+from zoneinfo import ZoneInfo
+
+from django.db import connections
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncHour
+
+TZ = ZoneInfo('America/New_York')
+HOURS_PER_WEEK = 168
+
+
+def _weekday(weekday):
+    """Django ExtractWeekDay numbering (1=Sun .. 7=Sat) of a Python weekday (0=Mon)."""
+    return (weekday + 1) % 7 + 1
+
+
+class TripAggregate:
+    """Trip count, fare/distance sums and per-day/hour/weekday/payment/zone counts."""
+
+    def __init__(self):
+        self.count = 0
+        self.fare_sum = 0.0
+        self.fare_n = 0
+        self.distance_sum = 0.0
+        self.distance_n = 0
+        self.by_day = Counter()
+        self.by_hour = Counter()
+        self.by_weekday = Counter()  # Django ExtractWeekDay numbering: 1=Sun .. 7=Sat
+        self.by_payment = Counter()
+        self.by_zone = Counter()
+
+    @classmethod
+    def from_queryset(cls, qs):
+        """
+        Aggregate of a trip queryset in two GROUP BYs: local pickup hour × payment type
+        (day, hour and weekday all derive from the hour bucket, so the timezone
+        conversion runs once per row) and pickup zone.
+        """
+        agg = cls()
+        rows = (
+            qs.annotate(h=TruncHour('pickup_datetime', tzinfo=TZ))
+            .values('h', 'payment_type')
+            .annotate(
+                c=Count('id'),
+                fare_sum=Sum('fare_amount'), fare_n=Count('fare_amount'),
+                distance_sum=Sum('trip_distance'), distance_n=Count('trip_distance'),
+            )
+            .order_by()
+        )
+        for r in rows:
+            local, c = r['h'], r['c']
+            agg.count += c
+            agg.fare_sum += r['fare_sum'] or 0
+            agg.fare_n += r['fare_n']
+            agg.distance_sum += r['distance_sum'] or 0
+            agg.distance_n += r['distance_n']
+            agg.by_day[local.date()] += c
+            agg.by_hour[local.hour] += c
+            agg.by_weekday[_weekday(local.weekday())] += c
+            agg.by_payment[r['payment_type']] += c
+        zones = qs.values('pulocation_id').annotate(c=Count('id')).order_by()
+        agg.by_zone = Counter({r['pulocation_id']: r['c'] for r in zones})
+        return agg
+
+    @classmethod
+    def from_frame(cls, df):
+        import pandas as pd
+
+        agg = cls()
+        local = df['pickup_datetime'].dt.tz_convert(TZ)
+        agg.count = len(df)
+        agg.fare_sum = float(df['fare_amount'].sum())
+        agg.fare_n = int(df['fare_amount'].count())
+        agg.distance_sum = float(df['trip_distance'].sum())
+        agg.distance_n = int(df['trip_distance'].count())
+        agg.by_day = Counter({ts.date(): int(c) for ts, c in local.dt.normalize().value_counts().items()})
+        agg.by_hour = Counter({int(h): int(c) for h, c in local.dt.hour.value_counts().items()})
+        agg.by_weekday = Counter({_weekday(int(d)): int(c) for d, c in local.dt.dayofweek.value_counts().items()})
+        agg.by_payment = Counter({
+            None if pd.isna(k) else float(k): int(c)
+            for k, c in df['payment_type'].value_counts(dropna=False).items()
+        })
+        agg.by_zone = Counter({
+            None if pd.isna(k) else int(k): int(c)
+            for k, c in df['pulocation_id'].value_counts(dropna=False).items()
+        })
+        return agg
+
+    def merge(self, other):
+        self.count += other.count
+        self.fare_sum += other.fare_sum
+        self.fare_n += other.fare_n
+        self.distance_sum += other.distance_sum
+        self.distance_n += other.distance_n
+        for name in ('by_day', 'by_hour', 'by_weekday', 'by_payment', 'by_zone'):
+            getattr(self, name).update(getattr(other, name))
+        return self
+
+
+# --- Hour-of-week pickups: sparse (keys, counts) with key = zone * 168 + hour of week ---
+
+def _hour_of_week(utc_hours):
+    """Local hour of week (Mon 00:00 = 0 .. Sun 23:00 = 167) of UTC hours since the epoch."""
+    import pandas as pd
+
+    local = pd.to_datetime(utc_hours * 3600, unit='s', utc=True).tz_convert(TZ)
+    return local.dayofweek.to_numpy() * 24 + local.hour.to_numpy()
+
+
+def _zone_hour_counts(zones, utc_hours, counts):
+    """Sum counts per zone × local hour of week. NYC offsets are whole hours, so UTC hour buckets map 1:1."""
+    import numpy as np
+
+    keys = zones * HOURS_PER_WEEK + _hour_of_week(utc_hours)
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+
+
+def hour_of_week_from_table(model, using):
+    """
+    (keys, counts) of one trip partition. SQLite groups by pickup zone and UTC hour
+    (strftime runs in C, no per-row Python); the timezone conversion is then vectorized
+    over the distinct hours.
+    """
+    import numpy as np
+
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT pulocation_id, CAST(strftime('%s', pickup_datetime) AS INTEGER) / 3600, COUNT(*) "
+            f'FROM {table} WHERE pulocation_id IS NOT NULL GROUP BY 1, 2'
+        )
+        rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+    return _zone_hour_counts(rows[:, 0], rows[:, 1], rows[:, 2])
+
+
+def hour_of_week_from_frame(df):
+    """(keys, counts) of an archived frame with pickup_datetime (tz-aware) and pulocation_id."""
+    import numpy as np
+
+    df = df[df['pulocation_id'].notna()]
+    utc = df['pickup_datetime'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+    hours = utc.astype('datetime64[h]').astype(np.int64)
+    return _zone_hour_counts(df['pulocation_id'].to_numpy(np.int64), hours, np.ones(len(df), dtype=np.int64))
@@ -1,19 +1,24 @@
 """
 Analytics queries and ML models for NYC Taxi Dashboard.
-All data is restricted to 2025.
+All data is restricted to 2025. Queries run on the read-only READ_DB connection.
+Exact panels read one TripAggregate per cab type, built in a single pass over the 2025
+trip partitions (see partitions.py) and archived (cold-tier) months; `all` is the merge
+of the cab types. The set is cached per process until the data version changes.
 """
+import math
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-from django.db.models import Count, Avg
-from django.db.models.functions import TruncDate, ExtractHour, ExtractWeekDay
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import PolynomialFeatures, StandardScaler
-from sklearn.linear_model import Ridge
-from sklearn.cluster import DBSCAN
-import numpy as np
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate, ExtractWeekDay
 
-from .models import TaxiTrip, TaxiZone
+from . import partitions
+from .aggregates import TripAggregate
+from .db import READ_DB
+from .models import ArchivedPartition, QuantileSketch, TaxiZone, TripSample, TripStratum
 
 TZ = ZoneInfo('America/New_York')
 YEAR_2025_START = datetime(2025, 1, 1, tzinfo=TZ)
@@ -30,86 +35,481 @@ PAYMENT_LABELS = {
     6: 'Voided trip',
 }
 WEEKDAY_LABELS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+# Normal quantile for 95% confidence intervals in approx=1 responses
+Z95 = 1.96
 
+# Zone dimension (location_id -> TaxiZone), loaded once per process; see warm_caches()
+_zone_cache = None
+# Exact panel aggregates: {'version': data_version, 'aggregates': {cab_type: TripAggregate}}
+_panel_cache = {}
+# Per hot partition: {(cab_type, month): (highest id, TripAggregate)}; rows are only appended
+_partition_cache = {}
+# Hour-of-week heatmap payloads: {'version': data_version, 'payloads': {cab_type: dict}}
+_hour_of_week_cache = {}
+# Per hot partition: {(cab_type, month): (highest id, (keys, counts))}
+_hour_of_week_partitions = {}
+# Duration panel results: {'version': data_version, 'results': {(cab_type, top_n): dict}}
+_duration_cache = {}
+# data_version of the current request_scope(), per thread
+_request = threading.local()
 
-def _base_qs(cab_type):
-    """Base queryset: cab type filter + 2025 only."""
-    qs = TaxiTrip.objects.filter(
-        pickup_datetime__gte=YEAR_2025_START,
-        pickup_datetime__lt=YEAR_2025_END,
-    )
+
+def _zones():
+    """All TaxiZones by location_id. Zones only change via load_zones, before the server starts."""
+    global _zone_cache
+    if _zone_cache is None:
+        zones = {z.location_id: z for z in TaxiZone.objects.using(READ_DB)}
+        if not zones:
+            return zones  # not loaded yet; retry on next call
+        _zone_cache = zones
+    return _zone_cache
+
+
+def warm_caches():
+    """
+    Import the heavy ML/dataframe modules and load the zone dimension, the exact
+    panel aggregates and the ingest dedup filter. Called in the gunicorn master
+    (preload_app) so forked workers share them copy-on-write.
+    """
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+    import sklearn.cluster  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    import sklearn.pipeline  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+    from . import archive, ingest  # noqa: F401
+    from .dedup import deduplicator
+
+    _panel_aggregates()
+    deduplicator.warm()
+    return len(_zones())
+
+
+@contextmanager
+def request_scope():
+    """
+    Read partitions.data_version() at most once inside the block (one API request), so
+    panels answered from the caches run no queries. Nested scopes share the outer one.
+    """
+    outer = getattr(_request, 'scope', None)
+    _request.scope = outer if outer is not None else {}
+    try:
+        yield
+    finally:
+        _request.scope = outer
+
+
+def _data_version():
+    scope = getattr(_request, 'scope', None)
+    if scope is None:
+        return partitions.data_version(using=READ_DB)
+    if 'version' not in scope:
+        scope['version'] = partitions.data_version(using=READ_DB)
+    return scope['version']
+
+
+# --- Cold tier: archived months (see archive.py) ---
+
+def _cold_partitions(cab_type):
+    qs = ArchivedPartition.objects.using(READ_DB).filter(month__gte=202501, month__lte=202512)
+    if cab_type and cab_type != 'all':
+        qs = qs.filter(cab_type=cab_type)
+    return list(qs)
+
+
+# --- Exact panels: every cab type in one pass, cached per data version ---
+
+def _refresh_partitions(cache, build):
+    """
+    {(cab_type, month): (highest id, build(model))} over the 2025 hot partitions, reusing
+    the entries of `cache` for partitions that have not gained rows since.
+    """
+    fresh = {}
+    for key in partitions.pruned('all', 202501, 202512, using=READ_DB):
+        model = partitions.model(*key)
+        last_id = model.objects.using(READ_DB).aggregate(m=Max('id'))['m']
+        cached = cache.get(key)
+        fresh[key] = cached if cached and cached[0] == last_id else (last_id, build(model))
+    return fresh
+
+
+def _panel_aggregates():
+    """
+    {cab_type: TripAggregate} for each cab type with 2025 data, hot and cold, plus 'all'
+    as their merge. Each partition and archived file is aggregated once; the result is
+    reused by every panel and cab filter until partitions.data_version() changes, and
+    then only partitions that gained rows are aggregated again.
+    """
+    global _panel_cache, _partition_cache
+    version = _data_version()
+    if _panel_cache.get('version') != version:
+        by_cab = defaultdict(TripAggregate)
+        _partition_cache = _refresh_partitions(
+            _partition_cache, lambda model: TripAggregate.from_queryset(model.objects.using(READ_DB)),
+        )
+        for (cab, _), (_, agg) in _partition_cache.items():
+            by_cab[cab].merge(agg)
+        cold = _cold_partitions('all')
+        if cold:
+            from .archive import partition_aggregate  # pulls in pandas/pyarrow
+
+            for part in cold:
+                by_cab[part.cab_type].merge(partition_aggregate(part))
+        total = TripAggregate()
+        for agg in by_cab.values():
+            total.merge(agg)
+        by_cab['all'] = total
+        _panel_cache = {'version': version, 'aggregates': dict(by_cab)}
+    return _panel_cache['aggregates']
+
+
+def _panels(cab_type):
+    """TripAggregate behind the exact panels for a cab filter (empty for unknown cab types)."""
+    return _panel_aggregates().get(cab_type or 'all') or TripAggregate()
+
+
+def _daily_counts(cab_type):
+    """[(date, trips)] in date order, hot and cold."""
+    return sorted(_panels(cab_type).by_day.items())
+
+
+def _ranked(counts, n=None):
+    """(key, count) pairs by descending count; ties by key so hot/cold merges order stably."""
+    ranked = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0] is None, kv[0] or 0))
+    return ranked[:n] if n is not None else ranked
+
+
+def _zone_counts(cab_type):
+    """Counter of pickups per pulocation_id, hot and cold."""
+    return _panels(cab_type).by_zone
+
+
+# --- Approximate answers from stratified samples (approx=1) ---
+
+def _strata(cab_type):
+    """{(cab_type, month, hour, tail): (population, sampled)} for 2025."""
+    qs = TripStratum.objects.using(READ_DB).filter(month__gte=202501, month__lte=202512)
+    if cab_type and cab_type != 'all':
+        qs = qs.filter(cab_type=cab_type)
+    return {(s.cab_type, s.month, s.hour, s.tail): (s.population, s.sampled) for s in qs}
+
+
+def _sample_qs(cab_type):
+    qs = TripSample.objects.using(READ_DB).filter(month__gte=202501, month__lte=202512)
     if cab_type and cab_type != 'all':
         qs = qs.filter(cab_type=cab_type)
     return qs
 
 
-def get_metrics(cab_type):
-    qs = _base_qs(cab_type)
-    total = qs.count()
+def _estimate_counts(strata, qs, key):
+    """
+    Stratified estimate of trip counts per value of `key` (an annotated sample column).
+    Returns {value: (estimate, ci95 half-width)}. Within a stratum the sample is a simple
+    random sample given its size; tail strata hold every trip and add no variance.
+    """
+    est = defaultdict(float)
+    var = defaultdict(float)
+    rows = qs.values('cab_type', 'month', 'hour', 'tail', key).annotate(c=Count('id'))
+    for r in rows:
+        N, n = strata.get((r['cab_type'], r['month'], r['hour'], r['tail']), (0, 0))
+        if not n:
+            continue
+        p = r['c'] / n
+        est[r[key]] += N * p
+        if n > 1:
+            var[r[key]] += N * N * (1 - n / N) * p * (1 - p) / (n - 1)
+    return {k: (round(v), round(Z95 * math.sqrt(var[k]))) for k, v in est.items()}
+
+
+def _estimate_mean(strata, qs, field):
+    """Stratified estimate of the mean of a nullable sample column: (mean, ci95 half-width)."""
+    rows = qs.filter(**{f'{field}__isnull': False}).values('cab_type', 'month', 'hour', 'tail').annotate(
+        m=Count(field), s=Sum(field), ss=Sum(F(field) * F(field)),
+    )
+    terms = []
+    for r in rows:
+        N, n = strata.get((r['cab_type'], r['month'], r['hour'], r['tail']), (0, 0))
+        m = r['m']
+        if not n or not m:
+            continue
+        var_h = (r['ss'] - r['s'] * r['s'] / m) / (m - 1) if m > 1 else 0.0
+        # Non-null population of the stratum, estimated from the sample's non-null share
+        terms.append((N * m / n, r['s'] / m, max(var_h, 0.0), m, N, n))
+    weight = sum(t[0] for t in terms)
+    if not weight:
+        return 0, 0
+    mean = sum(w * mu for w, mu, *_ in terms) / weight
+    var = sum((w / weight) ** 2 * (1 - n / N) * v / m for w, _, v, m, N, n in terms)
+    return mean, Z95 * math.sqrt(var)
+
+
+def _population_by_hour(strata):
+    by_h = defaultdict(int)
+    for (_, _, hour, _), (population, _) in strata.items():
+        by_h[hour] += population
+    return by_h
+
+
+def _approx_metrics(cab_type):
+    strata = _strata(cab_type)
+    if not strata:
+        return None
+    qs = _sample_qs(cab_type)
+    by_h = _population_by_hour(strata)
+    avg_fare, fare_ci = _estimate_mean(strata, qs, 'fare_amount')
+    avg_dist, dist_ci = _estimate_mean(strata, qs, 'trip_distance')
+    return {
+        'total_trips': sum(by_h.values()),
+        'avg_fare': round(avg_fare, 2),
+        'avg_fare_ci95': round(fare_ci, 2),
+        'avg_distance': round(avg_dist, 2),
+        'avg_distance_ci95': round(dist_ci, 2),
+        'busiest_hour': f"{max(by_h, key=by_h.get):02d}:00",
+        'approximate': True,
+        'sampled_trips': sum(n for _, n in strata.values()),
+    }
+
+
+def _approx_trips_over_time(cab_type):
+    strata = _strata(cab_type)
+    if not strata:
+        return None
+    qs = _sample_qs(cab_type).annotate(d=TruncDate('pickup_datetime', tzinfo=TZ))
+    est = _estimate_counts(strata, qs, 'd')
+    days = sorted(est)
+    return {
+        'labels': [d.strftime('%Y-%m-%d') for d in days],
+        'data': [est[d][0] for d in days],
+        'ci95': [est[d][1] for d in days],
+        'approximate': True,
+    }
+
+
+def _approx_trips_by_hour(cab_type):
+    """Exact: hour is a stratum key, so populations answer it without sampling error."""
+    strata = _strata(cab_type)
+    if not strata:
+        return None
+    by_h = _population_by_hour(strata)
+    return {
+        'labels': [f"{i:02d}:00" for i in range(24)],
+        'data': [by_h.get(i, 0) for i in range(24)],
+        'ci95': [0] * 24,
+        'approximate': True,
+    }
+
+
+def _approx_trips_by_weekday(cab_type):
+    strata = _strata(cab_type)
+    if not strata:
+        return None
+    qs = _sample_qs(cab_type).annotate(wd=ExtractWeekDay('pickup_datetime', tzinfo=TZ))
+    est = _estimate_counts(strata, qs, 'wd')
+    wd_order = [2, 3, 4, 5, 6, 7, 1]  # Mon=2, Tue=3, ..., Sun=1
+    return {
+        'labels': WEEKDAY_LABELS,
+        'data': [est.get(wd, (0, 0))[0] for wd in wd_order],
+        'ci95': [est.get(wd, (0, 0))[1] for wd in wd_order],
+        'approximate': True,
+    }
+
+
+def _approx_payment_type(cab_type):
+    strata = _strata(cab_type)
+    if not strata:
+        return None
+    est = _estimate_counts(strata, _sample_qs(cab_type), 'payment_type')
+    ordered = sorted(est.items(), key=lambda kv: -kv[1][0])
+    return {
+        'labels': [PAYMENT_LABELS.get(int(pt or 0), f"Type {pt}") for pt, _ in ordered],
+        'data': [e for _, (e, _) in ordered],
+        'ci95': [ci for _, (_, ci) in ordered],
+        'approximate': True,
+    }
+
+
+def _approx_heatmap(cab_type, top_n):
+    strata = _strata(cab_type)
+    if not strata:
+        return None
+    est = _estimate_counts(strata, _sample_qs(cab_type), 'pulocation_id')
+    top = sorted(est.items(), key=lambda kv: -kv[1][0])[:top_n]
+    zone_map = _zones()
+    points = []
+    for loc, (count, ci) in top:
+        z = zone_map.get(loc)
+        if z:
+            points.append({'zone': z.zone or str(loc), 'lat': z.lat, 'lon': z.lon, 'count': count, 'ci95': ci})
+    return {'points': points, 'approximate': True}
+
+
+def get_metrics(cab_type, approx=False):
+    if approx:
+        result = _approx_metrics(cab_type)
+        if result is not None:
+            return result
+    agg = _panels(cab_type)
+    by_hour = agg.by_hour
+    total = agg.count
     if total == 0:
         return {'total_trips': 0, 'avg_fare': 0, 'avg_distance': 0, 'busiest_hour': 'N/A'}
-    avg_fare = round(qs.aggregate(Avg('fare_amount'))['fare_amount__avg'] or 0, 2)
-    avg_dist = round(qs.aggregate(Avg('trip_distance'))['trip_distance__avg'] or 0, 2)
-    by_hour = qs.annotate(h=ExtractHour('pickup_datetime', tzinfo=TZ)).values('h').annotate(c=Count('id')).order_by('-c')
-    busiest = by_hour.first()
-    busiest_hour = f"{busiest['h']:02d}:00" if busiest else 'N/A'
+    avg_fare = round(agg.fare_sum / agg.fare_n, 2) if agg.fare_n else 0
+    avg_dist = round(agg.distance_sum / agg.distance_n, 2) if agg.distance_n else 0
+    busiest_hour = f"{max(by_hour, key=by_hour.get):02d}:00" if by_hour else 'N/A'
     return {'total_trips': total, 'avg_fare': avg_fare, 'avg_distance': avg_dist, 'busiest_hour': busiest_hour}
 
 
-def get_trips_over_time(cab_type):
-    qs = _base_qs(cab_type).annotate(d=TruncDate('pickup_datetime', tzinfo=TZ)).values('d').annotate(c=Count('id')).order_by('d')
-    labels = []
-    data = []
-    for r in qs:
-        d_val = r['d']
-        if hasattr(d_val, 'strftime'):
-            labels.append(d_val.strftime('%Y-%m-%d'))
-        else:
-            labels.append(str(d_val)[:10])  # e.g. "2025-01-15"
-        data.append(int(r['c']))
+def get_trips_over_time(cab_type, approx=False):
+    if approx:
+        result = _approx_trips_over_time(cab_type)
+        if result is not None:
+            return result
+    daily = _daily_counts(cab_type)
+    labels = [d.strftime('%Y-%m-%d') for d, _ in daily]
+    data = [int(c) for _, c in daily]
     return {'labels': labels, 'data': data}
 
 
-def get_trips_by_hour(cab_type):
-    qs = _base_qs(cab_type).annotate(h=ExtractHour('pickup_datetime', tzinfo=TZ)).values('h').annotate(c=Count('id')).order_by('h')
-    by_h = {r['h']: r['c'] for r in qs}
+def get_trips_by_hour(cab_type, approx=False):
+    if approx:
+        result = _approx_trips_by_hour(cab_type)
+        if result is not None:
+            return result
+    by_h = _panels(cab_type).by_hour
     labels = [f"{i:02d}:00" for i in range(24)]
     data = [by_h.get(i, 0) for i in range(24)]
     return {'labels': labels, 'data': data}
 
 
-def get_trips_by_weekday(cab_type):
-    qs = _base_qs(cab_type).annotate(wd=ExtractWeekDay('pickup_datetime', tzinfo=TZ)).values('wd').annotate(c=Count('id')).order_by('wd')
-    by_wd = {r['wd']: r['c'] for r in qs}  # 1=Sun, 2=Mon, ..., 7=Sat in Django
+def get_trips_by_weekday(cab_type, approx=False):
+    if approx:
+        result = _approx_trips_by_weekday(cab_type)
+        if result is not None:
+            return result
+    by_wd = _panels(cab_type).by_weekday  # 1=Sun, 2=Mon, ..., 7=Sat in Django
     labels = WEEKDAY_LABELS  # Mon..Sun
     wd_order = [2, 3, 4, 5, 6, 7, 1]  # Mon=2, Tue=3, ..., Sun=1
     data = [by_wd.get(wd_order[i], 0) for i in range(7)]
     return {'labels': labels, 'data': data}
 
 
-def get_payment_type(cab_type):
-    qs = _base_qs(cab_type).values('payment_type').annotate(c=Count('id')).order_by('-c')
-    labels = [PAYMENT_LABELS.get(int(r['payment_type'] or 0), f"Type {r['payment_type']}") for r in qs]
-    data = [r['c'] for r in qs]
+def get_payment_type(cab_type, approx=False):
+    if approx:
+        result = _approx_payment_type(cab_type)
+        if result is not None:
+            return result
+    by_pt = _panels(cab_type).by_payment
+    ordered = _ranked(by_pt)
+    labels = [PAYMENT_LABELS.get(int(pt or 0), f"Type {pt}") for pt, _ in ordered]
+    data = [c for _, c in ordered]
     return {'labels': labels, 'data': data}
 
 
-def get_heatmap(cab_type, top_n=150):
-    qs = _base_qs(cab_type).values('pulocation_id').annotate(c=Count('id')).order_by('-c')[:top_n]
-    zone_ids = [r['pulocation_id'] for r in qs]
-    zone_map = {z.location_id: z for z in TaxiZone.objects.filter(location_id__in=zone_ids)}
+def get_heatmap(cab_type, top_n=150, approx=False):
+    if approx:
+        result = _approx_heatmap(cab_type, top_n)
+        if result is not None:
+            return result
+    top = _ranked(_zone_counts(cab_type), top_n)
+    zone_map = _zones()
     points = []
-    for r in qs:
-        z = zone_map.get(r['pulocation_id'])
+    for loc, count in top:
+        z = zone_map.get(loc)
         if z:
-            points.append({'zone': z.zone or str(r['pulocation_id']), 'lat': z.lat, 'lon': z.lon, 'count': r['c']})
+            points.append({'zone': z.zone or str(loc), 'lat': z.lat, 'lon': z.lon, 'count': count})
     return {'points': points}
 
 
+def _encode_hour_of_week(zone_ids, parts):
+    """
+    Dense zone × 168 count matrix from sparse (keys, counts) parts, as base64 of the
+    smallest little-endian unsigned dtype that holds it. Rows follow zone_ids.
+    """
+    import base64
+
+    import numpy as np
+
+    from .aggregates import HOURS_PER_WEEK
+
+    keys = np.concatenate([k for k, _ in parts] or [np.empty(0, np.int64)])
+    counts = np.concatenate([c for _, c in parts] or [np.empty(0, np.int64)])
+    zone, hour = np.divmod(keys, HOURS_PER_WEEK)
+    known = np.isin(zone, zone_ids)
+    rows = np.searchsorted(zone_ids, zone[known])
+    dense = np.bincount(
+        rows * HOURS_PER_WEEK + hour[known], weights=counts[known], minlength=len(zone_ids) * HOURS_PER_WEEK,
+    ).astype(np.int64)
+    peak = int(dense.max()) if dense.size else 0
+    dtype = 'uint16' if peak <= np.iinfo(np.uint16).max else 'uint32'
+    return {
+        'shape': [len(zone_ids), HOURS_PER_WEEK],
+        'dtype': dtype,
+        'counts': base64.b64encode(dense.astype('<u2' if dtype == 'uint16' else '<u4').tobytes()).decode('ascii'),
+        'total': int(dense.sum()),
+        'max': peak,
+    }
+
+
+def _hour_of_week_payloads():
+    """{cab_type: payload} for each cab type plus 'all', rebuilt when the data version changes."""
+    global _hour_of_week_cache, _hour_of_week_partitions
+    import numpy as np
+
+    from .aggregates import hour_of_week_from_table
+
+    version = _data_version()
+    if _hour_of_week_cache.get('version') != version:
+        by_cab = defaultdict(list)
+        _hour_of_week_partitions = _refresh_partitions(
+            _hour_of_week_partitions, lambda model: hour_of_week_from_table(model, READ_DB),
+        )
+        for (cab, _), (_, counts) in _hour_of_week_partitions.items():
+            by_cab[cab].append(counts)
+        cold = _cold_partitions('all')
+        if cold:
+            from .archive import partition_hour_of_week
+
+            for part in cold:
+                by_cab[part.cab_type].append(partition_hour_of_week(part))
+        by_cab['all'] = [counts for parts in list(by_cab.values()) for counts in parts]
+        zone_map = _zones()
+        zones = [zone_map[loc] for loc in sorted(zone_map)]
+        zone_ids = np.array([z.location_id for z in zones], dtype=np.int64)
+        zone_table = {
+            'location_id': [z.location_id for z in zones],
+            'zone': [z.zone for z in zones],
+            'borough': [z.borough for z in zones],
+            'lat': [z.lat for z in zones],
+            'lon': [z.lon for z in zones],
+        }
+        payloads = {}
+        for cab, parts in by_cab.items():
+            payloads[cab] = {'zones': zone_table, **_encode_hour_of_week(zone_ids, parts)}
+        payloads[None] = {'zones': zone_table, **_encode_hour_of_week(zone_ids, [])}  # unknown cab types
+        _hour_of_week_cache = {'version': version, 'payloads': payloads}
+    return _hour_of_week_cache['payloads']
+
+
+def get_hour_of_week_heatmap(cab_type):
+    """
+    Pickups per zone × hour of week (NYC local; column = weekday * 24 + hour, Monday
+    00:00 = 0) over 2025, hot and cold. `counts` is the row-major matrix as base64 of
+    `dtype` (little-endian); rows follow the `zones` table, so a client can scrub
+    through all 168 hours from this one response.
+    """
+    payloads = _hour_of_week_payloads()
+    return payloads.get(cab_type or 'all', payloads[None])
+
+
 def get_demand_predictions(cab_type):
     """Ridge + Polynomial (degree=2), forecast next 7 days."""
-    qs = _base_qs(cab_type).annotate(d=TruncDate('pickup_datetime', tzinfo=TZ)).values('d').annotate(c=Count('id')).order_by('d')
-    daily = list(qs)
+    import numpy as np
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+    from sklearn.linear_model import Ridge
+
+    daily = [{'d': d, 'c': c} for d, c in _daily_counts(cab_type)]
     if len(daily) < 7:
         return {'labels': [], 'actual': [], 'predicted': []}
     last_31 = daily[-31:]
@@ -141,13 +541,40 @@ def get_demand_predictions(cab_type):
 
 
 def get_duration_predictions(cab_type, top_n=20):
-    """Fare distribution: top N trips by distance, actual fare."""
-    qs = _base_qs(cab_type).filter(
-        trip_distance__gt=0,
-        fare_amount__gte=0,
-        fare_amount__lt=500
-    ).order_by('pickup_datetime').values('trip_distance', 'fare_amount')[:1500]
-    trips = list(qs)
+    """Fare distribution: top N trips by distance, actual fare. Cached per data version."""
+    global _duration_cache
+    version = _data_version()
+    if _duration_cache.get('version') != version:
+        _duration_cache = {'version': version, 'results': {}}
+    key = (cab_type or 'all', top_n)
+    if key not in _duration_cache['results']:
+        _duration_cache['results'][key] = _duration_predictions(cab_type, top_n)
+    return _duration_cache['results'][key]
+
+
+def _duration_predictions(cab_type, top_n):
+    # Months are disjoint in time: stop once the oldest months hold 1500 matching trips
+    trips = []
+    month = None
+    for cab, m in partitions.pruned(cab_type, 202501, 202512, using=READ_DB):
+        if m != month and len(trips) >= 1500:
+            break
+        month = m
+        trips += partitions.model(cab, m).objects.using(READ_DB).filter(
+            trip_distance__gt=0,
+            fare_amount__gte=0,
+            fare_amount__lt=500
+        ).order_by('pickup_datetime').values('pickup_datetime', 'trip_distance', 'fare_amount')[:1500]
+    trips = sorted(trips, key=lambda t: t['pickup_datetime'])[:1500]
+    cold = _cold_partitions(cab_type)
+    if cold:
+        from .archive import earliest_rows  # pulls in pandas/pyarrow
+
+        trips += earliest_rows(
+            cold, ['trip_distance', 'fare_amount'], 1500,
+            where=lambda df: (df.trip_distance > 0) & (df.fare_amount >= 0) & (df.fare_amount < 500),
+        )
+        trips = sorted(trips, key=lambda t: t['pickup_datetime'])[:1500]
     if len(trips) < 50:
         return {'labels': [], 'actual': []}
     # Sort by distance ascending (less miles -> more miles) and take top N longest trips
@@ -159,15 +586,19 @@ def get_duration_predictions(cab_type, top_n=20):
 
 def get_cluster_zones(cab_type, eps=0.015, min_samples=3, top_zones=200):
     """DBSCAN clustering of top zones by pickup count."""
-    qs = _base_qs(cab_type).values('pulocation_id').annotate(c=Count('id')).order_by('-c')[:top_zones]
-    zone_ids = [r['pulocation_id'] for r in qs]
-    zones = list(TaxiZone.objects.filter(location_id__in=zone_ids))
+    import numpy as np
+    from sklearn.cluster import DBSCAN
+
+    top = _ranked(_zone_counts(cab_type), top_zones)
+    zone_ids = [loc for loc, _ in top]
+    zone_map = _zones()
+    zones = [zone_map[loc] for loc in sorted(set(zone_ids) - {None}) if loc in zone_map]
     if len(zones) < min_samples:
         return {'zones': []}
     coords = np.array([[z.lat, z.lon] for z in zones])
     clustering = DBSCAN(eps=eps, min_samples=min_samples, metric='euclidean').fit(coords)
     labels = clustering.labels_
-    count_map = {r['pulocation_id']: r['c'] for r in qs}
+    count_map = dict(top)
     result = []
     for z, lab in zip(zones, labels):
         result.append({
@@ -178,3 +609,41 @@ def get_cluster_zones(cab_type, eps=0.015, min_samples=3, top_zones=200):
             'cluster': int(lab),
         })
     return {'zones': result}
+
+
+def _percentile_summary(digest, quantiles):
+    out = {'count': digest.count, 'min': round(digest.min, 2), 'max': round(digest.max, 2)}
+    for q in quantiles:
+        out[f'p{q:g}'] = round(digest.quantile(q / 100), 2)
+    return out
+
+
+def get_percentiles(cab_type, start=None, end=None, quantiles=(50, 90, 99), group_by_month=False):
+    """
+    Percentiles of fare, distance, tip and duration (minutes) for pickup days in [start, end],
+    merged from the per-day t-digest sketches. Dates default to all of 2025.
+    """
+    from .sketches import METRICS, merge_sketches
+
+    start = start or YEAR_2025_START.date()
+    end = end or (YEAR_2025_END - timedelta(days=1)).date()
+    qs = QuantileSketch.objects.using(READ_DB).filter(day__gte=start, day__lte=end)
+    if cab_type and cab_type != 'all':
+        qs = qs.filter(cab_type=cab_type)
+    sketches = list(qs)
+    merged = merge_sketches(sketches)
+    result = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'quantiles': list(quantiles),
+        'metrics': {m: _percentile_summary(merged[m], quantiles) for m in METRICS if m in merged},
+    }
+    if group_by_month:
+        by_month = defaultdict(list)
+        for s in sketches:
+            by_month[s.day.strftime('%Y-%m')].append(s)
+        result['by_month'] = {
+            month: {m: _percentile_summary(d, quantiles) for m, d in merge_sketches(rows).items()}
+            for month, rows in sorted(by_month.items())
+        }
+    return result
@@ -0,0 +1,167 @@
+"""
+Hot/cold tiering. Closed cab_type × month partition tables are moved out of SQLite into
+Parquet files under settings.ARCHIVE_DIR (cab_type=<cab>/month=<YYYY-MM>/part-0.parquet)
+and listed in the ArchivedPartition catalog. Analytics merges per-partition aggregates
+computed from those files with the SQL aggregates of the remaining hot partitions.
+"""
+import os
+from zoneinfo import ZoneInfo
+
+import pyarrow.parquet as pq
+from django.db import connections
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from . import partitions
+from .aggregates import TripAggregate, hour_of_week_from_frame
+from .db import WRITE_DB, write_lock, write_transaction
+from .export import SCHEMA, iter_batches, to_table
+from .models import ArchivedPartition
+
+TZ = ZoneInfo('America/New_York')
+
+# Columns read from cold files to build the panel aggregates
+AGG_COLUMNS = ['pickup_datetime', 'fare_amount', 'trip_distance', 'payment_type', 'pulocation_id']
+
+# Partitions under this share of their cab type's largest month only hold strays from neighbouring months
+STRAY_SHARE = 0.01
+
+
+def month_label(month):
+    return f'{month // 100}-{month % 100:02d}'
+
+
+def archived_months(using=WRITE_DB):
+    """{(cab_type, YYYYMM)} already in the cold tier."""
+    return set(ArchivedPartition.objects.using(using).values_list('cab_type', 'month'))
+
+
+def hot_months():
+    """{(cab_type, YYYYMM): trips} of the non-empty partition tables."""
+    counts = {
+        key: partitions.model(*key).objects.using(WRITE_DB).count()
+        for key in partitions.existing(using=WRITE_DB)
+    }
+    return {key: n for key, n in counts.items() if n}
+
+
+def closed_months(keep_months=1, now=None, hot=None):
+    """
+    Hot (cab_type, YYYYMM) partitions eligible for archiving, oldest first: the month has
+    ended and it is older than the newest keep_months months loaded for that cab type.
+    Stray partitions (under STRAY_SHARE of the cab type's largest month, e.g. a few
+    next-month pickups in a monthly file) do not count as loaded months; those newer than
+    the kept months stay hot. `hot` is a precomputed hot_months() result.
+    """
+    now = (now or timezone.now()).astimezone(TZ)
+    current = now.year * 100 + now.month
+    by_cab = {}
+    for (cab_type, month), n in (hot if hot is not None else hot_months()).items():
+        by_cab.setdefault(cab_type, {})[month] = n
+    closed = []
+    for cab_type, counts in by_cab.items():
+        largest = max(counts.values())
+        loaded = sorted(m for m, n in counts.items() if n >= STRAY_SHARE * largest)
+        kept = loaded[-keep_months:] if keep_months > 0 else []
+        cutoff = min(kept[0], current) if kept else current
+        closed.extend((cab_type, m) for m in counts if m < cutoff)
+    return sorted(closed, key=lambda p: (p[1], p[0]))
+
+
+def archive_partition(cab_type, month):
+    """
+    Write one hot cab_type × month to Parquet, drop its partition table and record it in
+    the catalog, all in one transaction. Returns the ArchivedPartition, or None if the
+    partition has no hot rows.
+    """
+    rel_path = os.path.join(f'cab_type={cab_type}', f'month={month_label(month)}', 'part-0.parquet')
+    part = ArchivedPartition(cab_type=cab_type, month=month, path=rel_path)
+    path = part.file_path()
+    tmp = path.with_name(path.name + '.tmp')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    qs = partitions.model(cab_type, month).objects.using(WRITE_DB)
+    if (cab_type, month) not in partitions.existing(using=WRITE_DB):
+        return None
+    try:
+        with write_transaction(WRITE_DB):
+            bounds = qs.aggregate(n=Count('id'), lo=Min('pickup_datetime'), hi=Max('pickup_datetime'))
+            if not bounds['n']:
+                return None
+            with pq.ParquetWriter(tmp, SCHEMA, compression='zstd') as writer:
+                for batch in iter_batches(qs.order_by('pickup_datetime')):
+                    writer.write_table(to_table(batch), row_group_size=len(batch))
+            dropped = partitions.drop(cab_type, month, using=WRITE_DB)
+            if dropped != bounds['n']:
+                raise RuntimeError(f'{cab_type} {month_label(month)}: wrote {bounds["n"]} rows, dropped {dropped}')
+            part.rows = dropped
+            part.min_pickup = bounds['lo']
+            part.max_pickup = bounds['hi']
+            part.size_bytes = tmp.stat().st_size
+            part.save(using=WRITE_DB)
+            os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return part
+
+
+def vacuum():
+    """Rebuild the database file so the space freed by archiving is returned to the volume."""
+    # VACUUM cannot run in a transaction, but it is a write: queue it behind ingests
+    with write_lock(WRITE_DB), connections[WRITE_DB].cursor() as cursor:
+        cursor.execute('VACUUM')
+        # In WAL mode VACUUM writes the new file through the WAL; fold it back and truncate
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+# Archived files never change, so their aggregates are cached per process
+_aggregate_cache = {}
+_hour_of_week_cache = {}
+
+
+def partition_aggregate(part):
+    """TripAggregate of one archived file, computed with one columnar read."""
+    path = part.file_path()
+    key = (str(path), path.stat().st_mtime_ns)
+    agg = _aggregate_cache.get(key)
+    if agg is None:
+        df = pq.read_table(path, columns=AGG_COLUMNS).to_pandas()
+        agg = _aggregate_cache[key] = TripAggregate.from_frame(df)
+    return agg
+
+
+def partition_hour_of_week(part):
+    """Hour-of-week (keys, counts) of one archived file, see aggregates.hour_of_week_from_frame."""
+    path = part.file_path()
+    key = (str(path), path.stat().st_mtime_ns)
+    counts = _hour_of_week_cache.get(key)
+    if counts is None:
+        df = pq.read_table(path, columns=['pickup_datetime', 'pulocation_id']).to_pandas()
+        counts = _hour_of_week_cache[key] = hour_of_week_from_frame(df)
+    return counts
+
+
+def earliest_rows(parts, columns, limit, where=None):
+    """
+    Up to `limit` rows per partition in pickup order (files are written sorted), as dicts.
+    `where` is an optional DataFrame -> boolean mask filter applied while reading.
+    """
+    rows = []
+    for part in parts:
+        taken = 0
+        for rb in pq.ParquetFile(part.file_path()).iter_batches(columns=['pickup_datetime', *columns]):
+            df = rb.to_pandas()
+            if where is not None:
+                df = df[where(df)]
+            df = df.head(limit - taken)
+            rows.extend(df.to_dict('records'))
+            taken += len(df)
+            if taken >= limit:
+                break
+    return rows
+
+
+def iter_archived_rows(fields, batch_rows=20000):
+    """Every archived trip as lists of dicts with `fields`, oldest partition first."""
+    for part in ArchivedPartition.objects.using(WRITE_DB).order_by('month', 'cab_type'):
+        for rb in pq.ParquetFile(part.file_path()).iter_batches(batch_size=batch_rows, columns=list(fields)):
+            yield rb.to_pylist()
@@ -0,0 +1,101 @@
+"""
+Database aliases and SQLite connection tuning.
+Analytics reads through READ_DB (a mode=ro connection); ingest writes through WRITE_DB.
+Pragmas are applied once per connection, which CONN_MAX_AGE keeps open across requests.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows: rely on SQLite's busy timeout alone
+    fcntl = None
+
+READ_DB = 'readonly'
+WRITE_DB = 'default'
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created handler: WAL on the writer, mmap and page cache on every connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if connection.alias == WRITE_DB:
+            # WAL is persistent in the file; readers never block on (or block) the writer
+            cursor.execute('PRAGMA journal_mode = WAL')
+            # Durable at checkpoints; a power loss can drop only the last commits
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.execute(f'PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}')
+        cursor.execute(f'PRAGMA cache_size = {-int(settings.SQLITE_CACHE_KB)}')
+
+
+_held = threading.local()
+
+
+class WriteLockTimeout(Exception):
+    """Another writer held the database for longer than the lock timeout."""
+
+
+def _flock(f, timeout):
+    """Take an exclusive flock on f, polling until timeout seconds have passed."""
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while True:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise WriteLockTimeout(f'Database busy: another write did not finish within {timeout:g}s')
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.25)
+
+
+@contextmanager
+def write_lock(using=WRITE_DB, timeout=None):
+    """
+    Cross-process lock queueing this app's writers (ingest, archiving, rebuilds, VACUUM)
+    on one SQLite file, held in <db>.lock, so each runs as a whole instead of failing
+    part-way with "database is locked" between another process's writes. Polls for up to
+    timeout seconds (default DB_BUSY_TIMEOUT), then raises WriteLockTimeout before
+    anything is written. Re-entrant within a thread.
+    """
+    if getattr(_held, 'lock', False) or fcntl is None or connections[using].vendor != 'sqlite':
+        yield
+        return
+    with open(f"{settings.DATABASES[using]['NAME']}.lock", 'a') as f:
+        _flock(f, settings.DB_BUSY_TIMEOUT if timeout is None else timeout)
+        _held.lock = True
+        try:
+            yield
+        finally:
+            _held.lock = False
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def write_transaction(using=WRITE_DB):
+    """
+    transaction.atomic() under write_lock() that also takes SQLite's write lock up front,
+    like BEGIN IMMEDIATE. Django begins deferred transactions: one that reads first fails
+    at once with "database is locked" when it later writes while another connection
+    writes, as the busy timeout does not cover upgrading a read transaction.
+    """
+    with write_lock(using), transaction.atomic(using=using):
+        connection = connections[using]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('UPDATE sqlite_sequence SET seq = seq WHERE 0')
+        yield
+
+
+class ReadOnlyRouter:
+    """Keep migrate/makemigrations off the read-only alias (it is the same file as WRITE_DB)."""
+
+    def allow_migrate(self, db, app_label, **hints):
+        return False if db == READ_DB else None
@@ -0,0 +1,183 @@
+"""
+Row-level duplicate detection at ingest.
+Each trip gets a 64-bit content fingerprint stored in the indexed TaxiTrip.fingerprint
+column. A per-process Bloom filter over stored fingerprints answers "definitely new"
+for most rows; only Bloom hits are confirmed against the database. The filter is built
+at startup or in the background, so no request pays for scanning the whole table.
+"""
+import hashlib
+import math
+import threading
+
+import numpy as np
+from django.db import connections
+
+from .models import TaxiTrip
+
+# Target false-positive rate; each false positive costs one indexed lookup
+BLOOM_FP_RATE = 0.01
+BLOOM_MIN_CAPACITY = 1 << 20
+# Max fingerprints per IN (...) lookup (SQLite variable limit)
+LOOKUP_CHUNK = 900
+
+
+def _epoch(dt):
+    return int(dt.timestamp()) if dt is not None else ''
+
+
+def _amount(x):
+    return f'{x:.2f}' if x is not None else ''
+
+
+def fingerprint(row):
+    """Signed 64-bit hash of cab_type, pickup/dropoff times, zones and amounts."""
+    key = '|'.join((
+        row['cab_type'],
+        str(_epoch(row['pickup_datetime'])),
+        str(_epoch(row['dropoff_datetime'])),
+        str(row['pulocation_id'] if row['pulocation_id'] is not None else ''),
+        str(row['dolocation_id'] if row['dolocation_id'] is not None else ''),
+        _amount(row['fare_amount']),
+        _amount(row['tip_amount']),
+        _amount(row['total_amount']),
+    ))
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class BloomFilter:
+    """Bloom filter over 64-bit fingerprints using double hashing, vectorized with numpy."""
+
+    def __init__(self, capacity, fp_rate=BLOOM_FP_RATE):
+        self.capacity = capacity
+        nbits = int(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.nbits = max(nbits, 64)
+        self.k = max(1, round(self.nbits / capacity * math.log(2)))
+        self.bits = np.zeros((self.nbits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, fps):
+        u = np.asarray(fps, dtype=np.int64).view(np.uint64)
+        h1 = u & np.uint64(0xFFFFFFFF)
+        h2 = (u >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.k, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.nbits)
+
+    def add(self, fps):
+        if not len(fps):
+            return
+        pos = self._positions(fps).ravel()
+        np.bitwise_or.at(self.bits, (pos >> np.uint64(3)).astype(np.intp), (1 << (pos & np.uint64(7))).astype(np.uint8))
+        self.count += len(fps)
+
+    def might_contain(self, fps):
+        """Boolean array: False means definitely absent."""
+        if not len(fps):
+            return np.zeros(0, dtype=bool)
+        pos = self._positions(fps)
+        hit = self.bits[(pos >> np.uint64(3)).astype(np.intp)] & (1 << (pos & np.uint64(7))).astype(np.uint8)
+        return hit.all(axis=1)
+
+
+def _add_since(bloom, max_id):
+    """Add fingerprints of trips with id > max_id to a filter. Returns the new highest id."""
+    new = TaxiTrip.objects.filter(id__gt=max_id, fingerprint__isnull=False).order_by('id')
+    batch = []
+    for trip_id, fp in new.values_list('id', 'fingerprint').iterator(chunk_size=50000):
+        batch.append(fp)
+        max_id = trip_id
+        if len(batch) >= 50000:
+            bloom.add(batch)
+            batch = []
+    bloom.add(batch)
+    return max_id
+
+
+class Deduplicator:
+    """
+    Process-wide Bloom filter kept in sync with TaxiTrip by the highest id seen.
+    The full build scans every fingerprint, so it runs in warm() (gunicorn master) or a
+    background thread, never in a request; until it is ready all fingerprints are
+    checked with indexed lookups.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._max_id = 0
+        self._generation = 0  # bumped by reset() so a stale background build is discarded
+        self._builder = None
+
+    def _build(self, generation):
+        """Fill a filter sized for the current table and install it unless reset() ran meanwhile."""
+        total = TaxiTrip.objects.count()
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, 2 * total))
+        max_id = _add_since(bloom, 0)
+        with self._lock:
+            if generation == self._generation:
+                self._bloom, self._max_id = bloom, max_id
+
+    def _build_in_background(self):
+        if self._builder is not None and self._builder.is_alive():
+            return
+        generation = self._generation
+
+        def run():
+            try:
+                self._build(generation)
+            finally:
+                connections.close_all()
+
+        self._builder = threading.Thread(target=run, name='dedup-bloom', daemon=True)
+        self._builder.start()
+
+    def _sync(self):
+        """Add fingerprints of rows stored since the last sync (including this connection's own)."""
+        if self._bloom is None:
+            self._build_in_background()
+            return
+        if self._bloom.count > self._bloom.capacity:
+            # Keep using the fuller filter (more false positives, never false negatives) until the larger one is ready
+            self._build_in_background()
+        self._max_id = _add_since(self._bloom, self._max_id)
+
+    def warm(self):
+        """Build the filter now; called before gunicorn forks its workers."""
+        self._build(self._generation)
+
+    def reset(self):
+        """Drop the filter; call after a rolled-back ingest, whose ids SQLite may reuse."""
+        with self._lock:
+            self._generation += 1
+            self._bloom = None
+            self._max_id = 0
+
+    def filter_new(self, rows):
+        """
+        Set row['fingerprint'] on each trip dict and drop trips already stored or repeated
+        within the batch. Returns (new_rows, duplicate_count).
+        """
+        with self._lock:
+            self._sync()
+            fps = [fingerprint(r) for r in rows]
+            if self._bloom is None:
+                candidates = fps  # filter still building: confirm every row against the index
+            else:
+                maybe = self._bloom.might_contain(fps)
+                candidates = [fp for fp, m in zip(fps, maybe) if m]
+            stored = set()
+            for i in range(0, len(candidates), LOOKUP_CHUNK):
+                chunk = candidates[i:i + LOOKUP_CHUNK]
+                stored.update(TaxiTrip.objects.filter(fingerprint__in=chunk).values_list('fingerprint', flat=True))
+            new_rows = []
+            seen = set()
+            for r, fp in zip(rows, fps):
+                if fp in stored or fp in seen:
+                    continue
+                seen.add(fp)
+                r['fingerprint'] = fp
+                new_rows.append(r)
+        return new_rows, len(rows) - len(new_rows)
+
+
+deduplicator = Deduplicator()
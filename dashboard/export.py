@@ -0,0 +1,181 @@
+"""
+Streaming export of filtered trips as CSV or Parquet for /api/export/.
+Rows are read in fixed-size batches (archived Parquet partitions first, then the hot
+partition tables on the read-only connection, both month by month) and encoded one
+batch at a time, so memory stays flat and the first bytes go out immediately. SCHEMA is
+also the cold-tier file format.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta
+from functools import reduce
+from zoneinfo import ZoneInfo
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from . import partitions
+from .db import READ_DB
+from .models import ArchivedPartition
+
+TZ = ZoneInfo('America/New_York')
+
+# Rows per fetch, per CSV chunk and per Parquet row group
+BATCH_ROWS = 20000
+
+FIELDS = (
+    'cab_type', 'pickup_datetime', 'dropoff_datetime', 'passenger_count', 'trip_distance',
+    'pulocation_id', 'dolocation_id', 'payment_type', 'fare_amount', 'extra', 'mta_tax',
+    'tip_amount', 'tolls_amount', 'improvement_surcharge', 'total_amount',
+    'congestion_surcharge', 'airport_fee', 'cbd_congestion_fee',
+)
+SCHEMA = pa.schema([
+    ('cab_type', pa.string()),
+    ('pickup_datetime', pa.timestamp('us', tz='UTC')),
+    ('dropoff_datetime', pa.timestamp('us', tz='UTC')),
+    ('passenger_count', pa.float64()),
+    ('trip_distance', pa.float64()),
+    ('pulocation_id', pa.int32()),
+    ('dolocation_id', pa.int32()),
+    *((f, pa.float64()) for f in FIELDS[7:]),
+])
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def _local_midnight(day):
+    return datetime.combine(day, time.min, TZ)
+
+
+def export_querysets(cab_type='all', start=None, end=None, zones=None):
+    """
+    Trips for cab_type with pickup day in [start, end] (local dates, inclusive) and
+    pickup zone in zones: one queryset per partition the range touches, oldest month
+    first, each oldest trip first. Without a zone list SQLite walks the partition's
+    pickup index in order, so rows stream without a sort step.
+    """
+    first = start.year * 100 + start.month if start else None
+    last = end.year * 100 + end.month if end else None
+    querysets = []
+    for qs in partitions.querysets(cab_type, first, last, using=READ_DB):
+        if start:
+            qs = qs.filter(pickup_datetime__gte=_local_midnight(start))
+        if end:
+            qs = qs.filter(pickup_datetime__lt=_local_midnight(end + timedelta(days=1)))
+        if zones:
+            qs = qs.filter(pulocation_id__in=zones)
+        querysets.append(qs.order_by('pickup_datetime'))
+    return querysets
+
+
+def iter_batches(qs, batch_rows=BATCH_ROWS):
+    """Lists of value tuples (FIELDS order) streamed from the database cursor."""
+    batch = []
+    for row in qs.values_list(*FIELDS).iterator(chunk_size=batch_rows):
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def to_table(batch):
+    """pyarrow Table with SCHEMA from a list of value tuples in FIELDS order."""
+    columns = list(zip(*batch))
+    return pa.Table.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, SCHEMA)],
+        schema=SCHEMA,
+    )
+
+
+def _cold_batches(cab_type, start, end, zones, batch_rows):
+    """Matching rows of archived partitions, oldest month first, as value-tuple batches."""
+    parts = ArchivedPartition.objects.using(READ_DB).order_by('month', 'cab_type')
+    if cab_type and cab_type != 'all':
+        parts = parts.filter(cab_type=cab_type)
+    if start:
+        parts = parts.filter(month__gte=start.year * 100 + start.month)
+    if end:
+        parts = parts.filter(month__lte=end.year * 100 + end.month)
+    pickup_type = SCHEMA.field('pickup_datetime').type
+    for part in parts:
+        for rb in pq.ParquetFile(part.file_path()).iter_batches(batch_size=batch_rows, columns=list(FIELDS)):
+            masks = []
+            if start:
+                masks.append(pc.greater_equal(rb['pickup_datetime'], pa.scalar(_local_midnight(start), pickup_type)))
+            if end:
+                masks.append(pc.less(rb['pickup_datetime'], pa.scalar(_local_midnight(end + timedelta(days=1)), pickup_type)))
+            if zones:
+                masks.append(pc.is_in(rb['pulocation_id'], value_set=pa.array(zones, pa.int32())))
+            if masks:
+                rb = rb.filter(reduce(pc.and_, masks))
+            if rb.num_rows:
+                yield list(zip(*(col.to_pylist() for col in rb.columns)))
+
+
+def export_batches(cab_type='all', start=None, end=None, zones=None, batch_rows=BATCH_ROWS):
+    """All trips matching the filters as value-tuple batches: archived months, then the hot partitions."""
+    yield from _cold_batches(cab_type, start, end, zones, batch_rows)
+    for qs in export_querysets(cab_type, start, end, zones):
+        yield from iter_batches(qs, batch_rows)
+
+
+class _Chunks:
+    """Write-only file object that hands each written chunk back to the response iterator."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_csv(batches):
+    """Header line, then one encoded chunk per batch. Datetimes are written in UTC."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+    yield buf.getvalue().encode()
+    for batch in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue().encode()
+
+
+def stream_parquet(batches):
+    """One Parquet row group per batch; the footer is written after the last batch."""
+    sink = _Chunks()
+    writer = pq.ParquetWriter(sink, SCHEMA, compression='zstd')
+    yield sink.drain()  # magic bytes: the client sees the download start at once
+    try:
+        for batch in batches:
+            writer.write_table(to_table(batch), row_group_size=len(batch))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,139 @@
+"""
+Shared ingestion pipeline for the upload API, the load-sample API and the load_sample command.
+Every ingested file is recorded as an IngestRun with per-stage telemetry.
+Writes go through the WRITE_DB connection; dashboard reads on READ_DB are not blocked.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import archive, partitions, sampling, sketches
+from .db import WRITE_DB, write_lock, write_transaction
+from .dedup import deduplicator
+from .models import IngestRun
+from .parsers import parse_parquet, parse_csv
+from .telemetry import IngestStats, MemoryBudget, current_rss, parse_size
+
+SAMPLE_FILES = [
+    ('yellow', 'yellow_tripdata_2025-01.parquet'),
+    ('yellow', 'yellow_tripdata_2025-02.parquet'),
+    ('yellow', 'yellow_tripdata_2025-03.parquet'),
+    ('green', 'green_tripdata_2025-01.parquet'),
+    ('green', 'green_tripdata_2025-02.parquet'),
+    ('green', 'green_tripdata_2025-03.parquet'),
+]
+
+
+def file_sha256(path):
+    """sha256 hex digest of a file, stored as IngestRun.file_hash so watchers skip loaded files."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def _finish(run, stats):
+    run.finished_at = timezone.now()
+    run.rows_read = stats.rows_read
+    run.rows_skipped = stats.rows_skipped
+    run.rejected = dict(stats.rejected)
+    run.stages = stats.stages_dict()
+    run.peak_rss_bytes = stats.peak_rss
+    run.save()
+
+
+def _insert_batch(rows, stats, budget, archived):
+    with stats.stage('dedup', len(rows)):
+        if archived:
+            # Closed months live in the cold tier and are not reopened
+            kept = [r for r in rows if sampling.stratum_of(r['cab_type'], r['pickup_datetime'])[:2] not in archived]
+            if len(kept) < len(rows):
+                stats.reject('archived_month', len(rows) - len(kept))
+            rows = kept
+        rows, duplicates = deduplicator.filter_new(rows)
+    if duplicates:
+        stats.reject('duplicate', duplicates)
+    rss_before = current_rss()
+    with stats.stage('insert', len(rows)):
+        groups = partitions.instances(rows)
+        budget.observe('insert', len(rows), current_rss() - rss_before)
+        partitions.bulk_create(groups, using=WRITE_DB)
+        sampling.add_trips(rows)
+        sketches.add_trips(rows)
+    budget.check('insert')
+    return len(rows)
+
+
+def ingest_file(source, cab_type, name=None, origin='upload', max_rows=100000, sample_across=True,
+                memory_limit=None, file_hash=''):
+    """
+    Parse a CSV or Parquet file (path or uploaded file) and insert its trips into their
+    cab_type × month partitions, creating missing ones.
+    Rows are read and inserted in batches sized to stay under memory_limit bytes
+    (default settings.INGEST_MEMORY_LIMIT; unset = unlimited). The file loads in one
+    transaction, so a MemoryBudgetExceeded or parse error leaves no partial data.
+    Trips already stored (same content fingerprint) are skipped and counted as
+    rejected['duplicate']; trips in an archived month as rejected['archived_month'].
+    file_hash (the source's sha256, if known) is stored on the run.
+    Ingests in other threads or processes (upload, ingest_watch) wait for each other,
+    see db.write_lock().
+    Returns the finished IngestRun. Errors are recorded on the run, then re-raised.
+    """
+    name = name or str(getattr(source, 'name', source))
+    if memory_limit is None and settings.INGEST_MEMORY_LIMIT:
+        memory_limit = parse_size(settings.INGEST_MEMORY_LIMIT)
+    with write_lock(WRITE_DB):
+        return _ingest(source, cab_type, name, origin, max_rows, sample_across, memory_limit, file_hash)
+
+
+def _ingest(source, cab_type, name, origin, max_rows, sample_across, memory_limit, file_hash):
+    run = IngestRun.objects.create(source=name[:255], origin=origin, cab_type=cab_type, file_hash=file_hash)
+    stats = IngestStats()
+    try:
+        budget = MemoryBudget(memory_limit)
+        if name.lower().endswith('.parquet'):
+            rows = parse_parquet(source, cab_type, max_rows, sample_across=sample_across, stats=stats, budget=budget)
+        else:
+            rows = parse_csv(source, cab_type, max_rows, stats=stats, budget=budget)
+        archived = archive.archived_months()
+        inserted = 0
+        with write_transaction(WRITE_DB):
+            batch = []
+            batch_rows = budget.batch_rows('insert')
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    inserted += _insert_batch(batch, stats, budget, archived)
+                    batch = []
+                    batch_rows = budget.batch_rows('insert')
+            if batch:
+                inserted += _insert_batch(batch, stats, budget, archived)
+            connection = connections[WRITE_DB]
+            if connection.vendor == 'sqlite':
+                # Refresh query-planner statistics for the indexes touched by the load. Inside
+                # the transaction: on its own, ANALYZE's read-then-write fails at once
+                # ("database is locked") when another connection is writing.
+                with stats.stage('index', inserted), connection.cursor() as cursor:
+                    cursor.execute('PRAGMA optimize')
+        run.rows_inserted = inserted
+        run.status = 'ok'
+    except Exception as e:
+        deduplicator.reset()
+        run.status = 'failed'
+        run.error = str(e)
+        raise
+    finally:
+        _finish(run, stats)
+    return run
+
+
+def summarize(run):
+    """One-line human summary of an IngestRun for command output."""
+    parts = []
+    for name, s in run.stages.items():
+        if s['seconds']:
+            rate = f" @ {s['rows_per_sec']:,.0f} rows/s" if s['rows_per_sec'] else ''
+            parts.append(f"{name} {s['seconds']:.2f}s{rate}")
+    rejected = ', '.join(f'{k}={v}' for k, v in sorted(run.rejected.items())) or 'none'
+    rss = f'{run.peak_rss_bytes / 1048576:.0f} MB' if run.peak_rss_bytes else 'n/a'
+    return f"{'; '.join(parts)} | rejected: {rejected} | peak RSS {rss}"
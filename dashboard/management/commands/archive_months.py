@@ -0,0 +1,91 @@
+"""
+Move closed months out of their SQLite partition tables into the cold tier: one Parquet file
+per cab_type × month under ARCHIVE_DIR, recorded in ArchivedPartition, then VACUUM.
+Analytics keeps answering over both tiers.
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import archive
+from dashboard.telemetry import format_size
+
+
+def _month(value):
+    try:
+        year, mon = (int(x) for x in value.split('-'))
+    except ValueError:
+        raise CommandError(f'Invalid month {value!r}, expected YYYY-MM')
+    if not 1 <= mon <= 12:
+        raise CommandError(f'Invalid month {value!r}, expected YYYY-MM')
+    return year * 100 + mon
+
+
+def _db_size(path):
+    return sum(os.path.getsize(p) for p in (path, f'{path}-wal') if os.path.exists(p))
+
+
+class Command(BaseCommand):
+    help = 'Archive closed month partitions from SQLite to Parquet (cab_type/month) and VACUUM'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=1,
+            help='Newest loaded months per cab type to keep hot (default: 1)',
+        )
+        parser.add_argument(
+            '--month',
+            action='append',
+            default=[],
+            help='Archive only this month (YYYY-MM); repeatable. Still skips the current month.',
+        )
+        parser.add_argument(
+            '--cab-type',
+            choices=['yellow', 'green'],
+            default=None,
+            help='Archive only this cab type',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the partitions that would be archived',
+        )
+        parser.add_argument(
+            '--no-vacuum',
+            action='store_true',
+            help='Skip VACUUM after archiving',
+        )
+
+    def handle(self, *args, **options):
+        months = {_month(m) for m in options['month']}
+        keep = 0 if months else options['keep_months']
+        hot = archive.hot_months()
+        todo = [
+            (cab, month) for cab, month in archive.closed_months(keep_months=keep, hot=hot)
+            if (not months or month in months) and (not options['cab_type'] or cab == options['cab_type'])
+        ]
+        if not todo:
+            self.stdout.write('No closed months to archive')
+            return
+        for cab, month in todo:
+            self.stdout.write(f'{cab} {archive.month_label(month)}: {hot[(cab, month)]} trips')
+        if options['dry_run']:
+            return
+
+        db_path = settings.DATABASES['default']['NAME']
+        size_before = _db_size(db_path)
+        for cab, month in todo:
+            part = archive.archive_partition(cab, month)
+            if part:
+                self.stdout.write(
+                    f'Archived {part.rows} {cab} trips for {archive.month_label(month)} '
+                    f'-> {part.path} ({format_size(part.size_bytes)})'
+                )
+        if not options['no_vacuum']:
+            archive.vacuum()
+        self.stdout.write(self.style.SUCCESS(
+            f'Database {format_size(size_before)} -> {format_size(_db_size(db_path))}'
+        ))
@@ -0,0 +1,187 @@
+"""
+Watch the data/ directory and ingest new or changed trip files as they appear.
+Files named <yellow|green>_tripdata_*.parquet / .csv are picked up once they stop
+changing. A file counts as changed when its size or mtime moves and its sha256 differs
+from the last version ingested (by any origin that recorded the file's hash). Files are
+handed to a background ingest thread through a bounded queue: while it is full, scanning
+waits (backpressure). A failed file is retried with exponential backoff. Each committed
+ingest changes partitions.data_version(), so dashboard caches refresh on the next request.
+The watcher starts scanning once the database has no unapplied migrations.
+"""
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+from dashboard.db import WRITE_DB
+from dashboard.ingest import file_sha256, ingest_file, summarize
+from dashboard.models import IngestRun
+from dashboard.telemetry import parse_size
+
+TRIP_FILE_RE = re.compile(r'^(?P<cab>[a-z]+)_tripdata_.*\.(parquet|csv)$', re.IGNORECASE)
+CAB_TYPES = ('yellow', 'green')
+# Retry a failed file after 30 s, doubling up to 15 min
+RETRY_DELAY = 30
+RETRY_MAX_DELAY = 900
+
+
+def _migrations_pending():
+    executor = MigrationExecutor(connections[WRITE_DB])
+    return bool(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+
+
+class Command(BaseCommand):
+    help = 'Continuously ingest new or changed *_tripdata_* Parquet/CSV files from data/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir',
+            type=str,
+            default=None,
+            help='Override data directory path',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between directory scans (default: 5)',
+        )
+        parser.add_argument(
+            '--settle',
+            type=float,
+            default=5.0,
+            help='Ignore files modified less than this many seconds ago, still being written (default: 5)',
+        )
+        parser.add_argument(
+            '--queue-size',
+            type=int,
+            default=2,
+            help='Files waiting for ingest before scanning pauses (default: 2)',
+        )
+        parser.add_argument(
+            '--max-rows',
+            type=int,
+            default=100000,
+            help='Max rows per file (default: 100000)',
+        )
+        parser.add_argument(
+            '--memory-limit',
+            type=parse_size,
+            default=None,
+            help='Cap peak memory while ingesting, e.g. 512M or 2G (default: INGEST_MEMORY_LIMIT setting)',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Scan once, ingest what was found and exit',
+        )
+
+    def handle(self, *args, **options):
+        base_dir = Path(__file__).resolve().parent.parent.parent.parent
+        data_dir = Path(options['data_dir']) if options['data_dir'] else base_dir / 'data'
+        if not data_dir.is_dir():
+            raise CommandError(f'Data directory {data_dir} not found')
+        if options['queue_size'] < 1:
+            raise CommandError('--queue-size must be at least 1')
+
+        if _migrations_pending():
+            self.stdout.write('Waiting for migrations to be applied')
+            while _migrations_pending():
+                time.sleep(options['interval'])
+
+        # name -> (size, mtime_ns, sha256) of the version last queued or skipped
+        self.seen = {}
+        # name -> (failed attempts, time of the next try)
+        self.retry = {}
+        # (name, sha256) already ingested, by an earlier watcher or load_sample
+        self.ingested = set(
+            IngestRun.objects.filter(status='ok').exclude(file_hash='').values_list('source', 'file_hash')
+        )
+        jobs = queue.Queue(maxsize=options['queue_size'])
+        worker = threading.Thread(target=self._work, args=(jobs, options), name='ingest-watch', daemon=True)
+        worker.start()
+        self.stdout.write(f'Watching {data_dir} every {options["interval"]:g}s')
+        try:
+            while True:
+                for job in self._scan(data_dir, options['settle']):
+                    # Blocks while the queue is full, so a burst of files never piles up in memory
+                    jobs.put(job)
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current file')
+            while True:
+                try:
+                    jobs.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            jobs.put(None)
+            worker.join()
+
+    def _scan(self, data_dir, settle):
+        """Yield (path, cab_type, sha256) for trip files that are new or changed and settled."""
+        now = time.time()
+        for path in sorted(data_dir.iterdir()):
+            m = TRIP_FILE_RE.match(path.name)
+            if not m or not path.is_file():
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            seen = self.seen.get(path.name)
+            if seen and seen[:2] == (st.st_size, st.st_mtime_ns):
+                continue
+            if now - st.st_mtime < settle:
+                continue  # still being copied; look again next scan
+            retry = self.retry.get(path.name)
+            if retry and now < retry[1]:
+                continue
+            cab_type = m.group('cab').lower()
+            if cab_type not in CAB_TYPES:
+                self.seen[path.name] = (st.st_size, st.st_mtime_ns, None)
+                self.stdout.write(self.style.WARNING(f'Skip {path.name} (unsupported cab type {cab_type!r})'))
+                continue
+            try:
+                digest = file_sha256(path)
+            except OSError:
+                continue  # renamed or removed while hashing (e.g. copy-then-rename); look again next scan
+            changed = not seen or seen[2] != digest
+            self.seen[path.name] = (st.st_size, st.st_mtime_ns, digest)
+            if changed and (path.name, digest) not in self.ingested:
+                yield path, cab_type, digest
+
+    def _work(self, jobs, options):
+        """Ingest queued files one at a time until the None sentinel."""
+        try:
+            while True:
+                job = jobs.get()
+                if job is None:
+                    return
+                path, cab_type, digest = job
+                try:
+                    run = ingest_file(
+                        path, cab_type, name=path.name, origin='watch', max_rows=options['max_rows'],
+                        memory_limit=options['memory_limit'], file_hash=digest,
+                    )
+                except Exception as e:
+                    attempts = self.retry.get(path.name, (0, 0))[0] + 1
+                    delay = min(RETRY_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+                    self.retry[path.name] = (attempts, time.time() + delay)
+                    # Forget the file so a later scan queues it again
+                    self.seen.pop(path.name, None)
+                    self.stdout.write(self.style.ERROR(f'Failed {path.name}: {e} (retry in {delay}s)'))
+                    continue
+                self.retry.pop(path.name, None)
+                self.ingested.add((path.name, digest))
+                self.stdout.write(f'Loaded {run.rows_inserted} {cab_type} trips from {path.name} (run {run.id})')
+                self.stdout.write(f'  {summarize(run)}')
+        finally:
+            connections.close_all()
@@ -4,28 +4,15 @@ Pre-load sample parquet files from data/ directory.
  yellow_tripdata_2025-01,02,03.parquet
 Deletes any trips from years other than 2025 before loading.
 """
-from datetime import datetime
 from pathlib import Path
-from zoneinfo import ZoneInfo
 
 from django.core.management.base import BaseCommand
-from django.db.models import Q
 
-from dashboard.models import TaxiTrip
-from dashboard.parsers import parse_parquet
-
-TZ = ZoneInfo('America/New_York')
-YEAR_2025_START = datetime(2025, 1, 1, tzinfo=TZ)
-YEAR_2025_END = datetime(2026, 1, 1, tzinfo=TZ)
-
-SAMPLE_FILES = [
-    ('yellow', 'yellow_tripdata_2025-01.parquet'),
-    ('yellow', 'yellow_tripdata_2025-02.parquet'),
-    ('yellow', 'yellow_tripdata_2025-03.parquet'),
-    ('green', 'green_tripdata_2025-01.parquet'),
-    ('green', 'green_tripdata_2025-02.parquet'),
-    ('green', 'green_tripdata_2025-03.parquet'),
-]
+from dashboard import partitions
+from dashboard.db import WRITE_DB
+from dashboard.ingest import SAMPLE_FILES, file_sha256, ingest_file, summarize
+from dashboard.models import ArchivedPartition
+from dashboard.telemetry import parse_size
 
 
 class Command(BaseCommand):
@@ -49,23 +36,27 @@ class Command(BaseCommand):
             action='store_true',
             help='Skip loading if 2025 data already exists',
         )
+        parser.add_argument(
+            '--memory-limit',
+            type=parse_size,
+            default=None,
+            help='Cap peak memory while ingesting, e.g. 512M or 2G (default: INGEST_MEMORY_LIMIT setting)',
+        )
 
     def handle(self, *args, **options):
         base_dir = Path(__file__).resolve().parent.parent.parent.parent
         data_dir = Path(options['data_dir']) if options['data_dir'] else base_dir / 'data'
         max_rows = options['max_rows']
 
-        if options.get('skip_existing') and TaxiTrip.objects.filter(
-            pickup_datetime__gte=YEAR_2025_START,
-            pickup_datetime__lt=YEAR_2025_END,
-        ).exists():
+        if options.get('skip_existing') and (
+            any(qs.exists() for qs in partitions.querysets('all', 202501, 202512, using=WRITE_DB))
+            or ArchivedPartition.objects.filter(month__gte=202501, month__lte=202512).exists()
+        ):
             self.stdout.write('2025 data already loaded, skipping')
             return
 
-        # Delete any data from years other than 2025
-        deleted, _ = TaxiTrip.objects.filter(
-            Q(pickup_datetime__lt=YEAR_2025_START) | Q(pickup_datetime__gte=YEAR_2025_END)
-        ).delete()
+        # Drop the partitions of years other than 2025
+        deleted = partitions.drop_outside(202501, 202512)
         if deleted:
             self.stdout.write(f'Deleted {deleted} trips from previous/future years')
 
@@ -76,11 +67,11 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING(f'Skip {fname} (not found)'))
                 continue
             try:
-                rows = list(parse_parquet(path, cab_type, max_rows=max_rows))
-                objs = [TaxiTrip(**r) for r in rows]
-                TaxiTrip.objects.bulk_create(objs)
-                total += len(objs)
-                self.stdout.write(f'Loaded {len(objs)} {cab_type} trips from {fname}')
+                run = ingest_file(path, cab_type, name=fname, origin='command', max_rows=max_rows,
+                                  memory_limit=options['memory_limit'], file_hash=file_sha256(path))
+                total += run.rows_inserted
+                self.stdout.write(f'Loaded {run.rows_inserted} {cab_type} trips from {fname} (run {run.id})')
+                self.stdout.write(f'  {summarize(run)}')
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'Failed {fname}: {e}'))
 
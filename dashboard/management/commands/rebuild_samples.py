@@ -0,0 +1,16 @@
+"""
+Rebuild the stratified sample tables used by approx=1 queries from all loaded trips.
+Ingest maintains them incrementally; run this after loading data with an older version
+or after changing APPROX_SAMPLE_FRACTION.
+"""
+from django.core.management.base import BaseCommand
+
+from dashboard import sampling
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stratified trip samples (cab_type × month × hour) for approximate queries'
+
+    def handle(self, *args, **options):
+        population, sampled = sampling.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Sampled {sampled} of {population} trips'))
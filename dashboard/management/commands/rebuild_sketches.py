@@ -0,0 +1,15 @@
+"""
+Rebuild the per cab_type × day quantile sketches behind /api/percentiles/ from all loaded trips.
+Ingest maintains them incrementally; run this for data loaded with an older version.
+"""
+from django.core.management.base import BaseCommand
+
+from dashboard import sketches
+
+
+class Command(BaseCommand):
+    help = 'Rebuild t-digest sketches (fare, distance, tip, duration) per cab_type and day'
+
+    def handle(self, *args, **options):
+        count = sketches.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Built {count} sketches'))
@@ -0,0 +1,106 @@
+# Generated by Django 4.2
+
+import math
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen as of this migration: dashboard.sampling follows the live models, while this
+# backfill must keep producing the 0003 strata and samples.
+TZ = ZoneInfo('America/New_York')
+SAMPLE_FIELDS = ('pickup_datetime', 'pulocation_id', 'payment_type', 'fare_amount', 'trip_distance')
+BATCH_ROWS = 20000
+
+
+def _add_trips(rows, TripStratum, TripSample):
+    fraction = settings.APPROX_SAMPLE_FRACTION
+    by_stratum = defaultdict(list)
+    for r in rows:
+        local = r['pickup_datetime'].astimezone(TZ)
+        by_stratum[(r['cab_type'], local.year * 100 + local.month, local.hour)].append(r)
+    existing = {
+        (s.cab_type, s.month, s.hour): s
+        for s in TripStratum.objects.filter(
+            cab_type__in={k[0] for k in by_stratum},
+            month__in={k[1] for k in by_stratum},
+        )
+    }
+    created, updated, samples = [], [], []
+    for key, members in by_stratum.items():
+        stratum = existing.get(key)
+        if stratum is None:
+            stratum = TripStratum(cab_type=key[0], month=key[1], hour=key[2])
+            created.append(stratum)
+        else:
+            updated.append(stratum)
+        for r in members:
+            stratum.population += 1
+            if stratum.sampled < math.ceil(fraction * stratum.population):
+                stratum.sampled += 1
+                samples.append(TripSample(
+                    cab_type=key[0], month=key[1], hour=key[2],
+                    **{f: r[f] for f in SAMPLE_FIELDS},
+                ))
+    TripStratum.objects.bulk_create(created)
+    TripStratum.objects.bulk_update(updated, ['population', 'sampled'])
+    TripSample.objects.bulk_create(samples)
+
+
+def backfill_samples(apps, schema_editor):
+    """Sample the trips loaded before this migration; ingest keeps the strata current afterwards."""
+    TaxiTrip = apps.get_model('dashboard', 'TaxiTrip')
+    TripStratum = apps.get_model('dashboard', 'TripStratum')
+    TripSample = apps.get_model('dashboard', 'TripSample')
+    trips = TaxiTrip.objects.order_by('pickup_datetime').values('cab_type', *SAMPLE_FIELDS)
+    batch = []
+    for row in trips.iterator(chunk_size=BATCH_ROWS):
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            _add_trips(batch, TripStratum, TripSample)
+            batch = []
+    if batch:
+        _add_trips(batch, TripStratum, TripSample)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_ingestrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripStratum',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cab_type', models.CharField(max_length=10)),
+                ('month', models.IntegerField()),
+                ('hour', models.SmallIntegerField()),
+                ('population', models.BigIntegerField(default=0)),
+                ('sampled', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('cab_type', 'month', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TripSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cab_type', models.CharField(max_length=10)),
+                ('month', models.IntegerField()),
+                ('hour', models.SmallIntegerField()),
+                ('pickup_datetime', models.DateTimeField()),
+                ('pulocation_id', models.IntegerField(blank=True, null=True)),
+                ('payment_type', models.FloatField(blank=True, null=True)),
+                ('fare_amount', models.FloatField(blank=True, null=True)),
+                ('trip_distance', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cab_type', 'month', 'hour'], name='dashboard_s_stratum_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_samples, migrations.RunPython.noop),
+    ]
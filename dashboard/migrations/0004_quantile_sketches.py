@@ -0,0 +1,121 @@
+# Generated by Django 4.2
+
+import math
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.db import migrations, models
+
+# Frozen as of this migration: dashboard.sketches follows the live models, while this
+# backfill must keep producing the 0004 sketches.
+TZ = ZoneInfo('America/New_York')
+COMPRESSION = 100
+FIELDS = ('cab_type', 'pickup_datetime', 'dropoff_datetime', 'fare_amount', 'trip_distance', 'tip_amount')
+BATCH_ROWS = 20000
+
+
+def _metric_values(row):
+    if row['fare_amount'] is not None:
+        yield 'fare', row['fare_amount']
+    if row['trip_distance'] is not None:
+        yield 'distance', row['trip_distance']
+    if row['tip_amount'] is not None:
+        yield 'tip', row['tip_amount']
+    if row['dropoff_datetime'] is not None:
+        minutes = (row['dropoff_datetime'] - row['pickup_datetime']).total_seconds() / 60
+        if minutes >= 0:
+            yield 'duration', minutes
+
+
+def _compress(means, weights):
+    order = np.argsort(means, kind='stable')
+    means = means[order]
+    weights = weights[order]
+    cum = np.cumsum(weights)
+    q = (cum - weights / 2) / cum[-1]
+    bucket = np.floor(COMPRESSION / math.pi * np.arcsin(np.clip(2 * q - 1, -1, 1)) + COMPRESSION / 2)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    w = np.add.reduceat(weights, starts)
+    return np.add.reduceat(means * weights, starts) / w, w
+
+
+def _add_trips(rows, QuantileSketch):
+    values = defaultdict(list)
+    for r in rows:
+        day = r['pickup_datetime'].astimezone(TZ).date()
+        for metric, value in _metric_values(r):
+            values[(r['cab_type'], day, metric)].append(value)
+    existing = {
+        (s.cab_type, s.day, s.metric): s
+        for s in QuantileSketch.objects.filter(
+            cab_type__in={k[0] for k in values},
+            day__in={k[1] for k in values},
+        )
+    }
+    created, updated = [], []
+    for key, vals in values.items():
+        means = np.asarray(vals, dtype=np.float64)
+        weights = np.ones(len(means))
+        vmin, vmax = float(means.min()), float(means.max())
+        if len(means) > 1:
+            means, weights = _compress(means, weights)
+        sketch = existing.get(key)
+        if sketch is None:
+            sketch = QuantileSketch(cab_type=key[0], day=key[1], metric=key[2])
+            created.append(sketch)
+        else:
+            pairs = np.frombuffer(bytes(sketch.centroids), dtype=np.float64).reshape(-1, 2)
+            means = np.concatenate([pairs[:, 0], means])
+            weights = np.concatenate([pairs[:, 1], weights])
+            means, weights = _compress(means, weights)
+            vmin, vmax = min(sketch.min_value, vmin), max(sketch.max_value, vmax)
+            updated.append(sketch)
+        sketch.count = int(round(weights.sum()))
+        sketch.min_value = vmin
+        sketch.max_value = vmax
+        sketch.centroids = np.column_stack([means, weights]).tobytes()
+    QuantileSketch.objects.bulk_create(created)
+    QuantileSketch.objects.bulk_update(updated, ['count', 'min_value', 'max_value', 'centroids'])
+
+
+def backfill_sketches(apps, schema_editor):
+    """Sketch the trips loaded before this migration; ingest keeps them current afterwards."""
+    TaxiTrip = apps.get_model('dashboard', 'TaxiTrip')
+    QuantileSketch = apps.get_model('dashboard', 'QuantileSketch')
+    trips = TaxiTrip.objects.order_by('pickup_datetime').values(*FIELDS)
+    batch = []
+    for row in trips.iterator(chunk_size=BATCH_ROWS):
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            _add_trips(batch, QuantileSketch)
+            batch = []
+    if batch:
+        _add_trips(batch, QuantileSketch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_trip_samples'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuantileSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cab_type', models.CharField(max_length=10)),
+                ('day', models.DateField()),
+                ('metric', models.CharField(max_length=10)),
+                ('count', models.BigIntegerField(default=0)),
+                ('min_value', models.FloatField(blank=True, null=True)),
+                ('max_value', models.FloatField(blank=True, null=True)),
+                ('centroids', models.BinaryField()),
+            ],
+            options={
+                'unique_together': {('cab_type', 'day', 'metric')},
+            },
+        ),
+        migrations.RunPython(backfill_sketches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+FIELDS = (
+    'id', 'cab_type', 'pickup_datetime', 'dropoff_datetime', 'pulocation_id', 'dolocation_id',
+    'fare_amount', 'tip_amount', 'total_amount',
+)
+
+
+def backfill_fingerprints(apps, schema_editor):
+    from dashboard.dedup import fingerprint
+
+    TaxiTrip = apps.get_model('dashboard', 'TaxiTrip')
+    sql = f'UPDATE {TaxiTrip._meta.db_table} SET fingerprint = %s WHERE id = %s'
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for row in TaxiTrip.objects.order_by('id').values(*FIELDS).iterator(chunk_size=5000):
+            batch.append((fingerprint(row), row['id']))
+            if len(batch) >= 5000:
+                cursor.executemany(sql, batch)
+                batch = []
+        cursor.executemany(sql, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_quantile_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxitrip',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
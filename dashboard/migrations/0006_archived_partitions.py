@@ -0,0 +1,31 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_trip_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cab_type', models.CharField(max_length=10)),
+                ('month', models.IntegerField()),
+                ('path', models.CharField(max_length=255)),
+                ('rows', models.BigIntegerField(default=0)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('min_pickup', models.DateTimeField(blank=True, null=True)),
+                ('max_pickup', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['cab_type', 'month'],
+                'unique_together': {('cab_type', 'month')},
+            },
+        ),
+    ]
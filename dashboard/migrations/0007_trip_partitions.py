@@ -0,0 +1,143 @@
+# Generated by Django 4.2
+
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+# Frozen as of this migration: dashboard.partitions follows the live models, while this
+# migration must keep producing the 0007 schema. Later trip field changes are applied to
+# every partition with partitions.alter_partitions().
+TZ = ZoneInfo('America/New_York')
+VIEW = 'dashboard_taxitrip'
+PARTITION_FIELDS = [
+    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+    ('cab_type', models.CharField(max_length=10)),
+    ('pickup_datetime', models.DateTimeField(db_index=True)),
+    ('dropoff_datetime', models.DateTimeField(blank=True, null=True)),
+    ('passenger_count', models.FloatField(blank=True, null=True)),
+    ('trip_distance', models.FloatField(blank=True, null=True)),
+    ('pulocation_id', models.IntegerField(blank=True, db_index=True, null=True)),
+    ('dolocation_id', models.IntegerField(blank=True, null=True)),
+    ('payment_type', models.FloatField(blank=True, null=True)),
+    ('fare_amount', models.FloatField(blank=True, null=True)),
+    ('extra', models.FloatField(blank=True, null=True)),
+    ('mta_tax', models.FloatField(blank=True, null=True)),
+    ('tip_amount', models.FloatField(blank=True, null=True)),
+    ('tolls_amount', models.FloatField(blank=True, null=True)),
+    ('improvement_surcharge', models.FloatField(blank=True, null=True)),
+    ('total_amount', models.FloatField(blank=True, null=True)),
+    ('congestion_surcharge', models.FloatField(blank=True, null=True)),
+    ('airport_fee', models.FloatField(blank=True, null=True)),
+    ('cbd_congestion_fee', models.FloatField(blank=True, null=True)),
+    ('fingerprint', models.BigIntegerField(blank=True, db_index=True, null=True)),
+]
+COLUMNS = [name for name, _ in PARTITION_FIELDS]
+
+
+def _partition_model(registry, table):
+    attrs = {name: field.clone() for name, field in PARTITION_FIELDS}
+    attrs['Meta'] = type('Meta', (), {'db_table': table, 'app_label': 'dashboard', 'apps': registry})
+    attrs['__module__'] = __name__
+    return type(table, (models.Model,), attrs)
+
+
+def _month_bounds(month):
+    year, mon = divmod(month, 100)
+    return datetime(year, mon, 1, tzinfo=TZ), datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=TZ)
+
+
+def partition_trips(apps, schema_editor):
+    """Move dashboard_taxitrip into per cab_type × month tables and replace it with the view."""
+    TaxiTrip = apps.get_model('dashboard', 'TaxiTrip')
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    legacy = f'{VIEW}_legacy'
+    columns = ', '.join(qn(c) for c in COLUMNS)
+    months = (
+        TaxiTrip.objects.annotate(m=TruncMonth('pickup_datetime', tzinfo=TZ))
+        .values_list('cab_type', 'm')
+        .distinct()
+        .order_by()
+    )
+    keys = sorted({(cab, m.year * 100 + m.month) for cab, m in months}, key=lambda k: (k[1], k[0]))
+    for cab_type, _ in keys:
+        if not re.fullmatch(r'[a-z]+', cab_type):
+            raise ValueError(f'Invalid cab_type {cab_type!r}')
+    total = TaxiTrip.objects.count()
+    registry = Apps()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(VIEW)} RENAME TO {qn(legacy)}')
+        copied = 0
+        tables = []
+        for cab_type, month in keys:
+            table = f'{VIEW}_{cab_type}_{month}'
+            tables.append(table)
+            schema_editor.create_model(_partition_model(registry, table))
+            start, end = _month_bounds(month)
+            cursor.execute(
+                f'INSERT INTO {qn(table)} ({columns}) '
+                f'SELECT {columns} FROM {qn(legacy)} '
+                f'WHERE cab_type = %s AND pickup_datetime >= %s AND pickup_datetime < %s',
+                [
+                    cab_type,
+                    connection.ops.adapt_datetimefield_value(start),
+                    connection.ops.adapt_datetimefield_value(end),
+                ],
+            )
+            copied += cursor.rowcount
+        if copied != total:
+            raise RuntimeError(f'Partitioned {copied} of {total} trips')
+        if tables:
+            body = ' UNION ALL '.join(f'SELECT {columns} FROM {qn(t)}' for t in tables)
+        else:
+            body = 'SELECT ' + ', '.join(f'NULL AS {qn(c)}' for c in COLUMNS) + ' WHERE 0'
+        cursor.execute(f'CREATE VIEW {qn(VIEW)} AS {body}')
+        # Carry the id high-water mark under the view's name: SQLite forgets the legacy
+        # table's AUTOINCREMENT counter when it is dropped
+        cursor.execute(
+            "SELECT max(seq) FROM sqlite_sequence WHERE name = %s OR name LIKE %s ESCAPE '\\'",
+            [legacy, VIEW.replace('_', r'\_') + r'\_%'],
+        )
+        last = cursor.fetchone()[0] or 0
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [VIEW])
+        cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [VIEW, last])
+        cursor.execute(f'DROP TABLE {qn(legacy)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_archived_partitions'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(partition_trips),
+            ],
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='taxitrip',
+                    name='dashboard_t_cab_typ_2d1e1e_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='taxitrip',
+                    name='dashboard_t_cab_typ_3f4a2b_idx',
+                ),
+                migrations.AlterField(
+                    model_name='taxitrip',
+                    name='cab_type',
+                    field=models.CharField(max_length=10),
+                ),
+                migrations.AlterModelOptions(
+                    name='taxitrip',
+                    options={'managed': False, 'ordering': ['-pickup_datetime']},
+                ),
+            ],
+        ),
+    ]
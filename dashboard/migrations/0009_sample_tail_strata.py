@@ -0,0 +1,115 @@
+# Generated by Django 4.2
+
+import hashlib
+from collections import defaultdict
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen as of this migration: dashboard.sampling follows the live models, while this
+# resample must keep producing the 0009 strata and samples.
+TZ = ZoneInfo('America/New_York')
+SAMPLE_FIELDS = ('pickup_datetime', 'pulocation_id', 'payment_type', 'fare_amount', 'trip_distance')
+TAIL_LIMITS = {'trip_distance': 100.0, 'fare_amount': 500.0}
+BATCH_ROWS = 20000
+
+
+def _draw(row):
+    key = '|'.join((
+        row['cab_type'],
+        f"{row['pickup_datetime'].timestamp():.6f}",
+        *(str(row[f]) for f in SAMPLE_FIELDS[1:]),
+    ))
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') / 2 ** 64
+
+
+def _add_trips(rows, TripStratum, TripSample):
+    fraction = settings.APPROX_SAMPLE_FRACTION
+    by_stratum = defaultdict(list)
+    for r in rows:
+        local = r['pickup_datetime'].astimezone(TZ)
+        tail = any(r[f] is not None and abs(r[f]) > limit for f, limit in TAIL_LIMITS.items())
+        by_stratum[(r['cab_type'], local.year * 100 + local.month, local.hour, tail)].append(r)
+    existing = {
+        (s.cab_type, s.month, s.hour, s.tail): s
+        for s in TripStratum.objects.filter(
+            cab_type__in={k[0] for k in by_stratum},
+            month__in={k[1] for k in by_stratum},
+        )
+    }
+    created, updated, samples = [], [], []
+    for key, members in by_stratum.items():
+        stratum = existing.get(key)
+        if stratum is None:
+            stratum = TripStratum(cab_type=key[0], month=key[1], hour=key[2], tail=key[3])
+            created.append(stratum)
+        else:
+            updated.append(stratum)
+        for r in members:
+            stratum.population += 1
+            if key[3] or _draw(r) < fraction:
+                stratum.sampled += 1
+                samples.append(TripSample(
+                    cab_type=key[0], month=key[1], hour=key[2], tail=key[3],
+                    **{f: r[f] for f in SAMPLE_FIELDS},
+                ))
+    TripStratum.objects.bulk_create(created)
+    TripStratum.objects.bulk_update(updated, ['population', 'sampled'])
+    TripSample.objects.bulk_create(samples)
+
+
+def resample(apps, schema_editor):
+    """
+    Replace the systematic samples with hash-drawn ones and split off the tail strata,
+    over archived and hot trips; ingest keeps them current afterwards.
+    """
+    import pyarrow.parquet as pq
+
+    TaxiTrip = apps.get_model('dashboard', 'TaxiTrip')
+    TripStratum = apps.get_model('dashboard', 'TripStratum')
+    TripSample = apps.get_model('dashboard', 'TripSample')
+    ArchivedPartition = apps.get_model('dashboard', 'ArchivedPartition')
+    TripSample.objects.all().delete()
+    TripStratum.objects.all().delete()
+    columns = ['cab_type', *SAMPLE_FIELDS]
+    for part in ArchivedPartition.objects.order_by('month', 'cab_type'):
+        path = Path(settings.ARCHIVE_DIR) / part.path
+        for rb in pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS, columns=columns):
+            _add_trips(rb.to_pylist(), TripStratum, TripSample)
+    trips = TaxiTrip.objects.order_by('pickup_datetime').values(*columns)
+    batch = []
+    for row in trips.iterator(chunk_size=BATCH_ROWS):
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            _add_trips(batch, TripStratum, TripSample)
+            batch = []
+    if batch:
+        _add_trips(batch, TripStratum, TripSample)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_ingestrun_file_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tripstratum',
+            name='tail',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='tripsample',
+            name='tail',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tripstratum',
+            unique_together={('cab_type', 'month', 'hour', 'tail')},
+        ),
+        migrations.RunPython(resample, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 4.2
+
+import math
+from collections import defaultdict
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.db import migrations
+
+# Frozen as of this migration: dashboard.sketches follows the live models, while this
+# rebuild must keep producing the 0010 sketches.
+TZ = ZoneInfo('America/New_York')
+COMPRESSION = 200
+FIELDS = ('cab_type', 'pickup_datetime', 'dropoff_datetime', 'fare_amount', 'trip_distance', 'tip_amount')
+BATCH_ROWS = 20000
+
+
+def _metric_values(row):
+    if row['fare_amount'] is not None:
+        yield 'fare', row['fare_amount']
+    if row['trip_distance'] is not None:
+        yield 'distance', row['trip_distance']
+    if row['tip_amount'] is not None:
+        yield 'tip', row['tip_amount']
+    if row['dropoff_datetime'] is not None:
+        minutes = (row['dropoff_datetime'] - row['pickup_datetime']).total_seconds() / 60
+        if minutes >= 0:
+            yield 'duration', minutes
+
+
+def _k(q):
+    return COMPRESSION / math.pi * math.asin(2 * q - 1)
+
+
+def _q(k):
+    return (math.sin(min(k, COMPRESSION / 2) * math.pi / COMPRESSION) + 1) / 2
+
+
+def _compress(means, weights):
+    n = len(means)
+    if n <= 2:
+        return means, weights
+    order = np.argsort(means, kind='stable')
+    means = means[order]
+    weights = weights[order]
+    cum = np.cumsum(weights)
+    total = cum[-1]
+    starts = [0]
+    i = 1
+    while i < n - 1:
+        limit = total * _q(_k(cum[i - 1] / total) + 1)
+        j = min(max(int(np.searchsorted(cum, limit, side='right')), i + 1), n - 1)
+        starts.append(i)
+        i = j
+    starts.append(n - 1)
+    w = np.add.reduceat(weights, starts)
+    return np.add.reduceat(means * weights, starts) / w, w
+
+
+def _add_trips(rows, QuantileSketch):
+    values = defaultdict(list)
+    for r in rows:
+        day = r['pickup_datetime'].astimezone(TZ).date()
+        for metric, value in _metric_values(r):
+            values[(r['cab_type'], day, metric)].append(value)
+    existing = {
+        (s.cab_type, s.day, s.metric): s
+        for s in QuantileSketch.objects.filter(
+            cab_type__in={k[0] for k in values},
+            day__in={k[1] for k in values},
+        )
+    }
+    created, updated = [], []
+    for key, vals in values.items():
+        means, weights = _compress(np.asarray(vals, dtype=np.float64), np.ones(len(vals)))
+        vmin, vmax = float(min(vals)), float(max(vals))
+        sketch = existing.get(key)
+        if sketch is None:
+            sketch = QuantileSketch(cab_type=key[0], day=key[1], metric=key[2])
+            created.append(sketch)
+        else:
+            pairs = np.frombuffer(bytes(sketch.centroids), dtype=np.float64).reshape(-1, 2)
+            means, weights = _compress(np.concatenate([pairs[:, 0], means]), np.concatenate([pairs[:, 1], weights]))
+            vmin, vmax = min(sketch.min_value, vmin), max(sketch.max_value, vmax)
+            updated.append(sketch)
+        sketch.count = int(round(weights.sum()))
+        sketch.min_value = vmin
+        sketch.max_value = vmax
+        sketch.centroids = np.column_stack([means, weights]).tobytes()
+    QuantileSketch.objects.bulk_create(created)
+    QuantileSketch.objects.bulk_update(updated, ['count', 'min_value', 'max_value', 'centroids'])
+
+
+def rebuild_sketches(apps, schema_editor):
+    """
+    Recompute every sketch, over archived and hot trips, with centroids capped by the
+    scale function; the 0004 digests merged outliers into the tail centroids.
+    """
+    import pyarrow.parquet as pq
+
+    TaxiTrip = apps.get_model('dashboard', 'TaxiTrip')
+    QuantileSketch = apps.get_model('dashboard', 'QuantileSketch')
+    ArchivedPartition = apps.get_model('dashboard', 'ArchivedPartition')
+    QuantileSketch.objects.all().delete()
+    for part in ArchivedPartition.objects.order_by('month', 'cab_type'):
+        path = Path(settings.ARCHIVE_DIR) / part.path
+        for rb in pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS, columns=list(FIELDS)):
+            _add_trips(rb.to_pylist(), QuantileSketch)
+    trips = TaxiTrip.objects.order_by('pickup_datetime').values(*FIELDS)
+    batch = []
+    for row in trips.iterator(chunk_size=BATCH_ROWS):
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            _add_trips(batch, QuantileSketch)
+            batch = []
+    if batch:
+        _add_trips(batch, QuantileSketch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_sample_tail_strata'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_sketches, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 """
 Django models for NYC Taxi Dashboard.
 """
+from pathlib import Path
+
+from django.conf import settings
 from django.db import models
 
 
@@ -19,9 +22,9 @@ class TaxiZone(models.Model):
         return f"{self.zone or self.location_id} ({self.location_id})"
 
 
-class TaxiTrip(models.Model):
-    """Single taxi trip record (Yellow or Green)."""
-    cab_type = models.CharField(max_length=10, db_index=True)  # 'yellow' or 'green'
+class AbstractTaxiTrip(models.Model):
+    """Single taxi trip record (Yellow or Green). Stored in per cab_type × month tables, see partitions.py."""
+    cab_type = models.CharField(max_length=10)  # 'yellow' or 'green'
     pickup_datetime = models.DateTimeField(db_index=True)
     dropoff_datetime = models.DateTimeField(null=True, blank=True)
     passenger_count = models.FloatField(null=True, blank=True)
@@ -39,10 +42,133 @@ class TaxiTrip(models.Model):
     congestion_surcharge = models.FloatField(null=True, blank=True)
     airport_fee = models.FloatField(null=True, blank=True)
     cbd_congestion_fee = models.FloatField(null=True, blank=True)
+    fingerprint = models.BigIntegerField(null=True, blank=True, db_index=True)  # dedup.fingerprint()
+
+    class Meta:
+        abstract = True
+
+
+class TaxiTrip(AbstractTaxiTrip):
+    """
+    Read-only UNION ALL view over every trip partition. Write through partitions.bulk_create()
+    and query partitions directly where a month/cab_type range prunes them.
+    """
 
     class Meta:
+        managed = False
         ordering = ['-pickup_datetime']
+
+
+class IngestRun(models.Model):
+    """Telemetry for one ingested file: stage timings, throughput, rejected rows, peak RSS."""
+    source = models.CharField(max_length=255)  # file name or path
+    origin = models.CharField(max_length=20)  # 'upload', 'load_sample', 'command', 'watch'
+    cab_type = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, default='running')  # 'running', 'ok', 'failed'
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    rows_read = models.IntegerField(default=0)
+    rows_skipped = models.IntegerField(default=0)  # beyond max_rows, never parsed
+    rows_inserted = models.IntegerField(default=0)
+    rejected = models.JSONField(default=dict)  # reason -> row count
+    stages = models.JSONField(default=dict)  # stage -> {seconds, rows, rows_per_sec}
+    peak_rss_bytes = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    file_hash = models.CharField(max_length=64, blank=True)  # sha256 of a data/ source file, see ingest.file_sha256
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def as_dict(self):
+        elapsed = (self.finished_at - self.started_at).total_seconds() if self.finished_at else None
+        return {
+            'id': self.id,
+            'source': self.source,
+            'origin': self.origin,
+            'cab_type': self.cab_type,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'elapsed_seconds': round(elapsed, 3) if elapsed is not None else None,
+            'rows_read': self.rows_read,
+            'rows_skipped': self.rows_skipped,
+            'rows_inserted': self.rows_inserted,
+            'rejected': self.rejected,
+            'stages': self.stages,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'error': self.error,
+            'file_hash': self.file_hash,
+        }
+
+
+class TripStratum(models.Model):
+    """Population and sample size of one cab_type × month × hour stratum (approx=1 queries)."""
+    cab_type = models.CharField(max_length=10)
+    month = models.IntegerField()  # YYYYMM, NYC local time
+    hour = models.SmallIntegerField()  # 0-23, NYC local time
+    tail = models.BooleanField(default=False)  # extreme trips, all sampled; see sampling.TAIL_LIMITS
+    population = models.BigIntegerField(default=0)
+    sampled = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = [('cab_type', 'month', 'hour', 'tail')]
+
+
+class TripSample(models.Model):
+    """Stratified sample of TaxiTrip rows: the columns the counting and average panels need."""
+    cab_type = models.CharField(max_length=10)
+    month = models.IntegerField()  # YYYYMM, NYC local time
+    hour = models.SmallIntegerField()  # 0-23, NYC local time
+    tail = models.BooleanField(default=False)
+    pickup_datetime = models.DateTimeField()
+    pulocation_id = models.IntegerField(null=True, blank=True)
+    payment_type = models.FloatField(null=True, blank=True)
+    fare_amount = models.FloatField(null=True, blank=True)
+    trip_distance = models.FloatField(null=True, blank=True)
+
+    class Meta:
         indexes = [
-            models.Index(fields=['cab_type', 'pickup_datetime']),
-            models.Index(fields=['cab_type', 'pulocation_id']),
+            models.Index(fields=['cab_type', 'month', 'hour'], name='dashboard_s_stratum_idx'),
         ]
+
+
+class QuantileSketch(models.Model):
+    """Mergeable t-digest of one trip metric for one cab_type and day (NYC local)."""
+    cab_type = models.CharField(max_length=10)
+    day = models.DateField()
+    metric = models.CharField(max_length=10)  # 'fare', 'distance', 'tip', 'duration' (minutes)
+    count = models.BigIntegerField(default=0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    centroids = models.BinaryField()  # float64 (mean, weight) pairs
+
+    class Meta:
+        unique_together = [('cab_type', 'day', 'metric')]
+
+
+class ArchivedPartition(models.Model):
+    """Catalog entry for one closed cab_type × month moved from TaxiTrip to a cold-tier Parquet file."""
+    cab_type = models.CharField(max_length=10)
+    month = models.IntegerField()  # YYYYMM, NYC local time
+    path = models.CharField(max_length=255)  # relative to settings.ARCHIVE_DIR
+    rows = models.BigIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    min_pickup = models.DateTimeField(null=True, blank=True)
+    max_pickup = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['cab_type', 'month']
+        unique_together = [('cab_type', 'month')]
+
+    def file_path(self):
+        return Path(settings.ARCHIVE_DIR) / self.path
+
+    def as_dict(self):
+        return {
+            'cab_type': self.cab_type,
+            'month': f'{self.month // 100}-{self.month % 100:02d}',
+            'path': self.path,
+            'rows': self.rows,
+            'size_bytes': self.size_bytes,
+            'archived_at': self.archived_at.isoformat(),
+        }
@@ -3,12 +3,17 @@ CSV and Parquet parsing for NYC TLC trip data.
 Supports Yellow (tpep_*) and Green (lpep_*) schemas.
 Datetime: epoch ms, epoch seconds, or ISO string.
 """
-import io
+import contextlib
+import os
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
+
+from .telemetry import IngestStats, MemoryBudget
 
 TZ = ZoneInfo('America/New_York')
 
@@ -73,6 +78,19 @@ def _parse_datetime(val):
         return None
 
 
+def _pickup_or_reject(raw, stats):
+    """Parse the pickup datetime; count and return None for rows that must be dropped."""
+    dt = _parse_datetime(raw)
+    if dt is None:
+        missing = raw is None or (isinstance(raw, float) and raw != raw)
+        stats.reject('missing_pickup' if missing else 'unparseable_pickup')
+        return None
+    if dt.year != 2025:
+        stats.reject('outside_2025')
+        return None
+    return dt
+
+
 def _coerce_float(val, default=None):
     if val is None or (isinstance(val, float) and val != val):
         return default
@@ -91,35 +109,23 @@ def _coerce_int(val, default=None):
         return default
 
 
-def parse_parquet(path_or_file, cab_type, max_rows=100000, sample_across=True):
-    """
-    Parse parquet file and yield dicts for TaxiTrip bulk_create.
-    cab_type: 'yellow' or 'green'
-    sample_across: if True and file > max_rows, sample evenly across the file for better date distribution.
-    """
-    df = pd.read_parquet(path_or_file)
-    pickup_col = 'tpep_pickup_datetime' if cab_type == 'yellow' else 'lpep_pickup_datetime'
-    dropoff_col = 'tpep_dropoff_datetime' if cab_type == 'yellow' else 'lpep_dropoff_datetime'
-
-    if pickup_col not in df.columns:
-        raise ValueError(f"Missing {pickup_col} - is this {cab_type} taxi data?")
-
-    if sample_across and len(df) > max_rows:
-        # Sample evenly across file for better date distribution (avoids only first few days)
-        indices = np.linspace(0, len(df) - 1, max_rows, dtype=int)
-        df = df.iloc[indices]
-    else:
-        df = df.head(max_rows)
-
+def _parquet_rows(df, cab_type, pickup_col, dropoff_col, stats):
+    """Yield TaxiTrip dicts for one decoded parquet batch."""
+    has_dropoff = dropoff_col in df.columns
+    clock = time.perf_counter
     for i in range(len(df)):
+        t0 = clock()
         row = df.iloc[i]
-        dt = _parse_datetime(row.get(pickup_col))
-        if dt is None or dt.year != 2025:
+        dt = _pickup_or_reject(row.get(pickup_col), stats)
+        dropoff = _parse_datetime(row.get(dropoff_col)) if dt is not None and has_dropoff else None
+        t1 = clock()
+        stats.add('parse', t1 - t0, 1)
+        if dt is None:
             continue
-        yield {
+        out = {
             'cab_type': cab_type,
             'pickup_datetime': dt,
-            'dropoff_datetime': _parse_datetime(row.get(dropoff_col)) if dropoff_col in df.columns else None,
+            'dropoff_datetime': dropoff,
             'passenger_count': _coerce_float(row.get('passenger_count')),
             'trip_distance': _coerce_float(row.get('trip_distance')),
             'pulocation_id': _coerce_int(row.get('PULocationID')),
@@ -136,39 +142,105 @@ def parse_parquet(path_or_file, cab_type, max_rows=100000, sample_across=True):
             'airport_fee': _coerce_float(row.get('Airport_fee')) if cab_type == 'yellow' else None,
             'cbd_congestion_fee': _coerce_float(row.get('cbd_congestion_fee')),
         }
+        stats.add('coerce', clock() - t1, 1)
+        yield out
 
 
-def parse_csv(stream, cab_type, max_rows=100000):
+def parse_parquet(path_or_file, cab_type, max_rows=100000, sample_across=True, stats=None, budget=None):
     """
-    Parse CSV and yield dicts for TaxiTrip bulk_create.
-    Detects schema from headers (tpep_* vs lpep_*).
+    Parse parquet file and yield dicts for TaxiTrip bulk_create.
+    cab_type: 'yellow' or 'green'
+    sample_across: if True and file > max_rows, sample evenly across the file for better date distribution.
+    stats: optional IngestStats collecting stage timings and rejected-row counts.
+    budget: optional MemoryBudget; the file is decoded in record batches sized from it,
+    reading only the mapped columns, so memory does not scale with file size.
     """
-    df = pd.read_csv(stream, nrows=max_rows)
+    stats = stats or IngestStats()
+    budget = budget or MemoryBudget()
+    pickup_col = 'tpep_pickup_datetime' if cab_type == 'yellow' else 'lpep_pickup_datetime'
+    dropoff_col = 'tpep_dropoff_datetime' if cab_type == 'yellow' else 'lpep_dropoff_datetime'
+
+    pf = pq.ParquetFile(path_or_file)
+    names = pf.schema_arrow.names
+    if pickup_col not in names:
+        raise ValueError(f"Missing {pickup_col} - is this {cab_type} taxi data?")
+    mapping = YELLOW_COLS if cab_type == 'yellow' else GREEN_COLS
+    columns = [c for c in names if c in mapping]
+
+    total = pf.metadata.num_rows
+    stats.rows_read = total
+    if sample_across and total > max_rows:
+        # Sample evenly across file for better date distribution (avoids only first few days)
+        keep = np.linspace(0, total - 1, max_rows, dtype=int)
+        limit = total
+        stats.rows_skipped = total - max_rows
+    else:
+        keep = None
+        limit = min(total, max_rows)
+        stats.rows_skipped = total - limit
+
+    offset = 0
+    for rg in range(pf.num_row_groups):
+        if offset >= limit:
+            break
+        meta = pf.metadata.row_group(rg)
+        if offset == 0 and meta.num_rows:
+            budget.observe('read', meta.num_rows, 2 * meta.total_byte_size)
+        batches = pf.iter_batches(batch_size=budget.batch_rows('read'), row_groups=[rg], columns=columns)
+        while offset < limit:
+            with stats.stage('read'):
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                start, offset = offset, offset + batch.num_rows
+                if keep is not None:
+                    lo, hi = np.searchsorted(keep, [start, offset])
+                    batch = batch.take(keep[lo:hi] - start)
+                elif offset > limit:
+                    batch = batch.slice(0, limit - start)
+                df = batch.to_pandas()
+            stats.rows['read'] += len(df)
+            budget.observe('read', len(df), batch.nbytes + int(df.memory_usage(deep=True).sum()))
+            budget.check('read')
+            yield from _parquet_rows(df, cab_type, pickup_col, dropoff_col, stats)
+
+
+def _csv_columns(columns, cab_type):
     pickup_col = None
     dropoff_col = None
-    for c in df.columns:
+    for c in columns:
         if 'tpep_pickup' in c.lower() or (cab_type == 'yellow' and 'pickup' in c.lower()):
             pickup_col = c
         if 'tpep_dropoff' in c.lower() or 'lpep_dropoff' in c.lower() or 'dropoff' in c.lower():
             dropoff_col = c
     if pickup_col is None:
-        for c in df.columns:
+        for c in columns:
             if 'lpep_pickup' in c.lower() or (cab_type == 'green' and 'pickup' in c.lower()):
                 pickup_col = c
                 break
     if pickup_col is None:
         raise ValueError("Could not find pickup datetime column")
+    return pickup_col, dropoff_col
+
 
-    for _, row in df.iterrows():
-        dt = _parse_datetime(row.get(pickup_col))
-        if dt is None or dt.year != 2025:
+def _csv_rows(df, cab_type, pickup_col, dropoff_col, stats):
+    """Yield TaxiTrip dicts for one CSV chunk."""
+    clock = time.perf_counter
+    for i in range(len(df)):
+        t0 = clock()
+        row = df.iloc[i]
+        dt = _pickup_or_reject(row.get(pickup_col), stats)
+        dropoff = _parse_datetime(row.get(dropoff_col)) if dt is not None and dropoff_col else None
+        t1 = clock()
+        stats.add('parse', t1 - t0, 1)
+        if dt is None:
             continue
         puloc = row.get('PULocationID', row.get('pulocation_id'))
         doloc = row.get('DOLocationID', row.get('dolocation_id'))
-        yield {
+        out = {
             'cab_type': cab_type,
             'pickup_datetime': dt,
-            'dropoff_datetime': _parse_datetime(row.get(dropoff_col)) if dropoff_col else None,
+            'dropoff_datetime': dropoff,
             'passenger_count': _coerce_float(row.get('passenger_count')),
             'trip_distance': _coerce_float(row.get('trip_distance')),
             'pulocation_id': _coerce_int(puloc),
@@ -185,3 +257,71 @@ def parse_csv(stream, cab_type, max_rows=100000):
             'airport_fee': _coerce_float(row.get('Airport_fee')) if cab_type == 'yellow' else None,
             'cbd_congestion_fee': _coerce_float(row.get('cbd_congestion_fee')),
         }
+        stats.add('coerce', clock() - t1, 1)
+        yield out
+
+
+def _count_lines(stream):
+    """
+    Newlines in a CSV path or rewindable file, by a raw byte scan (no tokenizing; a
+    quoted field spanning lines counts extra). None if the stream cannot be re-read.
+    """
+    if isinstance(stream, (str, os.PathLike)):
+        f = open(stream, 'rb')
+    elif hasattr(stream, 'seek'):
+        f = contextlib.nullcontext(stream)
+    else:
+        return None
+    lines = 0
+    last = b''
+    with f as fh:
+        try:
+            fh.seek(0)
+        except (OSError, ValueError):
+            return None
+        while True:
+            chunk = fh.read(1 << 20)
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    return lines + (1 if last not in (b'', b'\n') else 0)
+
+
+def parse_csv(stream, cab_type, max_rows=100000, stats=None, budget=None):
+    """
+    Parse CSV and yield dicts for TaxiTrip bulk_create.
+    Detects schema from headers (tpep_* vs lpep_*).
+    stats: optional IngestStats collecting stage timings and rejected-row counts.
+    budget: optional MemoryBudget; the file is read in chunks sized from it.
+    Only the first max_rows rows are parsed. When the file has more, the rest are
+    counted by a newline scan so rows_read / rows_skipped report the file total like
+    parse_parquet.
+    """
+    stats = stats or IngestStats()
+    budget = budget or MemoryBudget()
+    reader = pd.read_csv(stream, nrows=max_rows, iterator=True)
+    pickup_col = dropoff_col = None
+    with reader:
+        while True:
+            with stats.stage('read'):
+                try:
+                    df = reader.get_chunk(budget.batch_rows('read'))
+                except StopIteration:
+                    break
+            if pickup_col is None:
+                pickup_col, dropoff_col = _csv_columns(df.columns, cab_type)
+            stats.rows['read'] += len(df)
+            stats.rows_read += len(df)
+            budget.observe('read', len(df), int(df.memory_usage(deep=True).sum()))
+            budget.check('read')
+            yield from _csv_rows(df, cab_type, pickup_col, dropoff_col, stats)
+    if stats.rows_read >= max_rows:
+        with stats.stage('read'):
+            lines = _count_lines(stream)
+        if lines is not None:
+            total = max(lines - 1, stats.rows_read)  # less the header
+            stats.rows_skipped = total - stats.rows_read
+            stats.rows_read = total
@@ -0,0 +1,253 @@
+"""
+Month-partitioned trip storage. Trips live in one table per cab_type × pickup month
+(NYC local), dashboard_taxitrip_<cab_type>_<YYYYMM>. TaxiTrip is a read-only UNION ALL
+view over every partition, rebuilt whenever one is created or dropped, so code that
+needs all trips keeps working; writers and range queries address partitions directly.
+Dropping a month is a DROP TABLE instead of a row-by-row DELETE.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from django.apps.registry import Apps
+from django.db import connections, models
+
+from .db import READ_DB, WRITE_DB, write_transaction
+from .models import AbstractTaxiTrip, ArchivedPartition, TaxiTrip
+
+TZ = ZoneInfo('America/New_York')
+VIEW = TaxiTrip._meta.db_table
+_TABLE_RE = re.compile(rf'^{VIEW}_([a-z]+)_(\d{{6}})$')
+# LIKE pattern (escape '\\') for the partition tables' names
+_TABLE_LIKE = VIEW.replace('_', r'\_') + r'\_%'
+
+# Partition models live in their own registry so migrations never see them
+_apps = Apps()
+_models = {}
+
+
+def month_of(pickup):
+    """YYYYMM of a pickup datetime in NYC local time."""
+    local = pickup.astimezone(TZ)
+    return local.year * 100 + local.month
+
+
+def month_bounds(month):
+    """[start, end) of a YYYYMM month in NYC local time."""
+    year, mon = divmod(month, 100)
+    start = datetime(year, mon, 1, tzinfo=TZ)
+    end = datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=TZ)
+    return start, end
+
+
+def table_name(cab_type, month):
+    if not re.fullmatch(r'[a-z]+', cab_type):
+        raise ValueError(f'Invalid cab_type {cab_type!r}')
+    return f'{VIEW}_{cab_type}_{month}'
+
+
+def model(cab_type, month):
+    """Model class bound to one partition table (the table may not exist yet)."""
+    key = (cab_type, month)
+    if key not in _models:
+        meta = type('Meta', (), {'db_table': table_name(cab_type, month), 'app_label': 'dashboard', 'apps': _apps})
+        _models[key] = type(f'TaxiTrip_{cab_type}_{month}', (AbstractTaxiTrip,), {'__module__': __name__, 'Meta': meta})
+    return _models[key]
+
+
+def existing(using=READ_DB):
+    """Sorted [(cab_type, YYYYMM)] of the partition tables in the database."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        names = connection.introspection.table_names(cursor)
+    keys = []
+    for name in names:
+        m = _TABLE_RE.match(name)
+        if m:
+            keys.append((m.group(1), int(m.group(2))))
+    return sorted(keys, key=lambda k: (k[1], k[0]))
+
+
+def pruned(cab_type='all', first_month=None, last_month=None, using=READ_DB):
+    """Partitions a cab_type filter and an inclusive YYYYMM range touch, oldest month first."""
+    return [
+        (cab, month) for cab, month in existing(using)
+        if (not cab_type or cab_type == 'all' or cab == cab_type)
+        and (first_month is None or month >= first_month)
+        and (last_month is None or month <= last_month)
+    ]
+
+
+def querysets(cab_type='all', first_month=None, last_month=None, using=READ_DB):
+    """One queryset per pruned partition, oldest month first."""
+    return [model(cab, month).objects.using(using) for cab, month in pruned(cab_type, first_month, last_month, using)]
+
+
+def _last_id(cursor):
+    """Highest trip id ever handed out: partitions' AUTOINCREMENT counters plus the view's carried-over row."""
+    cursor.execute(
+        "SELECT max(seq) FROM sqlite_sequence WHERE name = %s OR name LIKE %s ESCAPE '\\'",
+        [VIEW, _TABLE_LIKE],
+    )
+    return cursor.fetchone()[0] or 0
+
+
+def data_version(using=READ_DB):
+    """
+    Token that changes whenever trips are added, dropped or archived: the id high-water
+    mark, the partition set and the cold-tier catalog. Read from the database in one
+    query, so every process (web workers, ingest commands) agrees on it; cheap enough
+    to check per request.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT (SELECT max(seq) FROM sqlite_sequence WHERE name = %s OR name LIKE %s ESCAPE '\\'),"
+            " (SELECT group_concat(name) FROM (SELECT name FROM sqlite_master"
+            "  WHERE type = 'table' AND name LIKE %s ESCAPE '\\' ORDER BY name)),"
+            f" (SELECT max(id) FROM {ArchivedPartition._meta.db_table})",
+            [VIEW, _TABLE_LIKE, _TABLE_LIKE],
+        )
+        return cursor.fetchone()
+
+
+def keep_last_id(cursor):
+    """
+    Record the id high-water mark under the view's name before a partition is dropped
+    (SQLite forgets a dropped table's AUTOINCREMENT counter), so ids are never reused.
+    """
+    last = _last_id(cursor)
+    cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [VIEW])
+    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [VIEW, last])
+
+
+def refresh_view(cursor, connection, keys):
+    """
+    (Re)create the TaxiTrip view as the UNION ALL of the given partitions, over the
+    columns of the oldest one (all partitions share a schema, see alter_partitions()).
+    """
+    qn = connection.ops.quote_name
+    if keys:
+        description = connection.introspection.get_table_description(cursor, table_name(*keys[0]))
+        cols = ', '.join(qn(c.name) for c in description)
+        body = ' UNION ALL '.join(f'SELECT {cols} FROM {qn(table_name(*k))}' for k in keys)
+    else:
+        body = 'SELECT ' + ', '.join(f'NULL AS {qn(f.column)}' for f in TaxiTrip._meta.concrete_fields) + ' WHERE 0'
+    cursor.execute(f'DROP VIEW IF EXISTS {qn(VIEW)}')
+    cursor.execute(f'CREATE VIEW {qn(VIEW)} AS {body}')
+
+
+def alter_partitions(apps, schema_editor, change):
+    """
+    Apply a schema change to every partition table, then rebuild the TaxiTrip view.
+    Django does not manage the partitions (TaxiTrip is an unmanaged view and new
+    partitions are created from the live AbstractTaxiTrip), so a migration that changes
+    trip fields updates TaxiTrip's state and alters the existing tables with this:
+
+        def add_tip_ratio(apps, schema_editor):
+            field = models.FloatField(null=True, blank=True)
+            field.set_attributes_from_name('tip_ratio')
+            partitions.alter_partitions(apps, schema_editor, lambda mdl: schema_editor.add_field(mdl, field))
+
+        operations = [
+            migrations.RunPython(add_tip_ratio),
+            migrations.SeparateDatabaseAndState(state_operations=[
+                migrations.AddField('taxitrip', 'tip_ratio', models.FloatField(null=True, blank=True)),
+            ]),
+        ]
+
+    change(mdl) gets one partition's model built from the historical TaxiTrip in `apps`
+    (here the state before the new field), never from the live models.
+    """
+    connection = schema_editor.connection
+    trip = apps.get_model('dashboard', 'TaxiTrip')
+    registry = Apps()
+    keys = existing(connection.alias)
+    for cab_type, month in keys:
+        table = table_name(cab_type, month)
+        attrs = {f.name: f.clone() for f in trip._meta.local_fields}
+        attrs['Meta'] = type('Meta', (), {'db_table': table, 'app_label': 'dashboard', 'apps': registry})
+        attrs['__module__'] = __name__
+        change(type(table, (models.Model,), attrs))
+    with connection.cursor() as cursor:
+        refresh_view(cursor, connection, keys)
+
+
+def _create_sql(mdl, connection):
+    """
+    CREATE TABLE + CREATE INDEX statements for a partition model. The editor is not
+    entered: SQLite's editor refuses to run inside the ingest transaction and we only
+    need the SQL.
+    """
+    editor = connection.schema_editor(collect_sql=True)
+    editor.deferred_sql = []
+    editor.create_model(mdl)
+    return editor.collected_sql + [str(sql) for sql in editor.deferred_sql]
+
+
+def create(cab_type, month, using=WRITE_DB):
+    """Create a partition table (no-op if present) and add it to the TaxiTrip view."""
+    keys = existing(using)
+    mdl = model(cab_type, month)
+    if (cab_type, month) in keys:
+        return mdl
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for sql in _create_sql(mdl, connection):
+            cursor.execute(sql)
+        refresh_view(cursor, connection, sorted(keys + [(cab_type, month)], key=lambda k: (k[1], k[0])))
+    return mdl
+
+
+def drop(cab_type, month, using=WRITE_DB):
+    """Drop a partition table and remove it from the view. Returns the number of trips it held."""
+    keys = existing(using)
+    if (cab_type, month) not in keys:
+        return 0
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = table_name(cab_type, month)
+    rows = model(cab_type, month).objects.using(using).count()
+    with connection.cursor() as cursor:
+        keep_last_id(cursor)
+        refresh_view(cursor, connection, [k for k in keys if k != (cab_type, month)])
+        cursor.execute(f'DROP TABLE {qn(table)}')
+    return rows
+
+
+def instances(rows):
+    """Unsaved partition model instances for trip dicts: {(cab_type, YYYYMM): [obj, ...]}."""
+    groups = defaultdict(list)
+    for r in rows:
+        key = (r['cab_type'], month_of(r['pickup_datetime']))
+        groups[key].append(model(*key)(**r))
+    return groups
+
+
+def bulk_create(groups, using=WRITE_DB):
+    """
+    Insert instances() output, creating missing partitions. Ids are assigned from one
+    sequence across all partitions, so TaxiTrip.id stays unique and increasing.
+    Call inside the ingest transaction.
+    """
+    connection = connections[using]
+    present = set(existing(using))
+    with connection.cursor() as cursor:
+        next_id = _last_id(cursor) + 1
+    for key in sorted(groups, key=lambda k: (k[1], k[0])):
+        if key not in present:
+            create(*key, using=using)
+        objs = groups[key]
+        for obj in objs:
+            obj.id = next_id
+            next_id += 1
+        model(*key).objects.using(using).bulk_create(objs)
+
+
+def drop_outside(first_month, last_month, using=WRITE_DB):
+    """Drop every partition outside an inclusive YYYYMM range. Returns the number of trips dropped."""
+    with write_transaction(using):
+        return sum(
+            drop(cab, month, using=using) for cab, month in existing(using)
+            if not first_month <= month <= last_month
+        )
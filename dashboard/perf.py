@@ -0,0 +1,211 @@
+"""
+Per-panel query instrumentation for the dashboard API.
+Each analytics call records wall time, SQL query count, SQL time and rows returned.
+Timings are sent as Server-Timing headers and kept in rolling per-process windows.
+Each process pickles its window to settings.PERF_DIR at most every FLUSH_SECONDS, and
+/api/_perf/ merges the files of every live worker, so any worker serves the same view.
+Recording is a few perf_counter calls and a deque append, so it stays on in production.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+# Samples kept per panel (rolling window)
+WINDOW = 1000
+
+# Histogram bucket upper bounds in milliseconds; anything slower lands in '+Inf'
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Seconds between writes of this process's window to PERF_DIR
+FLUSH_SECONDS = 1.0
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+_flushed_at = 0.0
+
+
+class _QueryCounter:
+    """execute_wrapper that counts queries and accumulates SQL time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+def _row_count(result):
+    """Rows in a panel payload: length of its longest list, 1 for scalar panels."""
+    if isinstance(result, dict):
+        lengths = [len(v) for v in result.values() if isinstance(v, list)]
+        return max(lengths) if lengths else 1
+    return 1
+
+
+def record(name, wall_ms, queries, sql_ms, rows):
+    with _lock:
+        _samples[name].append((wall_ms, queries, sql_ms, rows))
+        due = time.monotonic() - _flushed_at >= FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def _path(pid):
+    return Path(settings.PERF_DIR) / f'{pid}.pickle'
+
+
+def flush():
+    """Write this process's window to PERF_DIR/<pid>.pickle (atomically; errors are ignored)."""
+    global _flushed_at
+    with _lock:
+        _flushed_at = time.monotonic()
+        data = {name: list(samples) for name, samples in _samples.items()}
+    path = _path(os.getpid())
+    tmp = path.with_name(f'{path.name}.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_bytes(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # instrumentation must not fail the request; snapshot() still has this process
+
+
+def _alive(pid):
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_samples():
+    """{pid: {panel: samples}} for this process and every live process with a file in PERF_DIR."""
+    with _lock:
+        workers = {os.getpid(): {name: list(samples) for name, samples in _samples.items()}}
+    try:
+        paths = list(Path(settings.PERF_DIR).glob('*.pickle'))
+    except OSError:
+        paths = []
+    for path in paths:
+        try:
+            pid = int(path.stem)
+        except ValueError:
+            continue
+        if pid in workers:
+            continue
+        if not _alive(pid):
+            path.unlink(missing_ok=True)  # exited worker; gunicorn replaced it
+            continue
+        try:
+            workers[pid] = pickle.loads(path.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError):
+            continue
+    return workers
+
+
+class RequestTimer:
+    """Collects panel timings for one request and renders the Server-Timing header."""
+
+    def __init__(self):
+        self.timings = []
+
+    def run(self, name, func, *args, **kwargs):
+        counter = _QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(counter))
+            result = func(*args, **kwargs)
+        wall_ms = (time.perf_counter() - start) * 1000
+        sql_ms = counter.seconds * 1000
+        rows = _row_count(result)
+        self.timings.append((name, wall_ms, counter.count, sql_ms, rows))
+        record(name, wall_ms, counter.count, sql_ms, rows)
+        return result
+
+    def header(self):
+        parts = [
+            f'{name};dur={wall:.1f};desc="{q} queries, {sql:.1f}ms sql, {rows} rows"'
+            for name, wall, q, sql, rows in self.timings
+        ]
+        if len(self.timings) > 1:
+            parts.append(f'total;dur={sum(t[1] for t in self.timings):.1f}')
+        return ', '.join(parts)
+
+    def annotate(self, response):
+        if self.timings:
+            response['Server-Timing'] = self.header()
+        return response
+
+
+def _percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0
+    idx = min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def _histogram(values):
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for v in values:
+        for i, bound in enumerate(BUCKETS_MS):
+            if v <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [str(b) for b in BUCKETS_MS] + ['+Inf']
+    return dict(zip(labels, counts))
+
+
+def snapshot():
+    """
+    Summary of the rolling windows of every live worker, merged per panel. Other workers'
+    samples are up to FLUSH_SECONDS old; `workers` lists the pids merged.
+    """
+    workers = _worker_samples()
+    data = defaultdict(list)
+    for panels in workers.values():
+        for name, samples in panels.items():
+            data[name].extend(samples)
+    panels = {}
+    for name, samples in sorted(data.items()):
+        wall = sorted(s[0] for s in samples)
+        sql = sorted(s[2] for s in samples)
+        n = len(samples)
+        panels[name] = {
+            'count': n,
+            'wall_ms': {
+                'p50': round(_percentile(wall, 50), 2),
+                'p90': round(_percentile(wall, 90), 2),
+                'p99': round(_percentile(wall, 99), 2),
+                'max': round(wall[-1], 2),
+                'histogram': _histogram(wall),
+            },
+            'sql_ms': {
+                'p50': round(_percentile(sql, 50), 2),
+                'p90': round(_percentile(sql, 90), 2),
+                'max': round(sql[-1], 2),
+            },
+            'queries_avg': round(sum(s[1] for s in samples) / n, 2),
+            'queries_max': max(s[1] for s in samples),
+            'rows_avg': round(sum(s[3] for s in samples) / n, 1),
+        }
+    return {'pid': os.getpid(), 'workers': sorted(workers), 'window': WINDOW, 'panels': panels}
@@ -0,0 +1,105 @@
+"""
+Stratified trip samples for approximate (approx=1) queries.
+Every cab_type × month × hour stratum keeps its exact population and a random sample
+maintained at ingest: each trip is kept with probability APPROX_SAMPLE_FRACTION, decided
+by a hash of its columns, so the sample does not depend on load order and a rebuild
+picks the same trips. Trips with an extreme distance or fare form separate tail strata
+that keep every trip.
+"""
+import hashlib
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+from .archive import iter_archived_rows
+from .db import write_transaction
+from .models import TaxiTrip, TripSample, TripStratum
+
+TZ = ZoneInfo('America/New_York')
+SAMPLE_FIELDS = ('pickup_datetime', 'pulocation_id', 'payment_type', 'fare_amount', 'trip_distance')
+
+# Trips beyond these magnitudes go to take-all tail strata: too rare for a 1% sample to
+# catch, and one of them moves a mean as much as thousands of ordinary trips
+TAIL_LIMITS = {'trip_distance': 100.0, 'fare_amount': 500.0}
+
+
+def stratum_of(cab_type, pickup):
+    local = pickup.astimezone(TZ)
+    return (cab_type, local.year * 100 + local.month, local.hour)
+
+
+def is_tail(row):
+    return any(row[f] is not None and abs(row[f]) > limit for f, limit in TAIL_LIMITS.items())
+
+
+def draw(row):
+    """Uniform [0, 1) from a hash of a trip dict's sampled columns; the same trip always draws the same value."""
+    key = '|'.join((
+        row['cab_type'],
+        f"{row['pickup_datetime'].timestamp():.6f}",
+        *(str(row[f]) for f in SAMPLE_FIELDS[1:]),
+    ))
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') / 2 ** 64
+
+
+def add_trips(rows):
+    """Count trip dicts into their strata and sample them. Call inside the ingest transaction."""
+    fraction = settings.APPROX_SAMPLE_FRACTION
+    by_stratum = defaultdict(list)
+    for r in rows:
+        by_stratum[(*stratum_of(r['cab_type'], r['pickup_datetime']), is_tail(r))].append(r)
+    if not by_stratum:
+        return
+    existing = {
+        (s.cab_type, s.month, s.hour, s.tail): s
+        for s in TripStratum.objects.filter(
+            cab_type__in={k[0] for k in by_stratum},
+            month__in={k[1] for k in by_stratum},
+        )
+    }
+    created, updated, samples = [], [], []
+    for key, members in by_stratum.items():
+        stratum = existing.get(key)
+        if stratum is None:
+            stratum = TripStratum(cab_type=key[0], month=key[1], hour=key[2], tail=key[3])
+            created.append(stratum)
+        else:
+            updated.append(stratum)
+        for r in members:
+            stratum.population += 1
+            if key[3] or draw(r) < fraction:
+                stratum.sampled += 1
+                samples.append(TripSample(
+                    cab_type=key[0], month=key[1], hour=key[2], tail=key[3],
+                    **{f: r[f] for f in SAMPLE_FIELDS},
+                ))
+    TripStratum.objects.bulk_create(created)
+    TripStratum.objects.bulk_update(updated, ['population', 'sampled'])
+    TripSample.objects.bulk_create(samples)
+
+
+def hot_batches(qs, chunk_size=20000):
+    """Lists of up to chunk_size trip dicts from a values() queryset, oldest pickup first."""
+    batch = []
+    for row in qs.order_by('pickup_datetime').iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild(chunk_size=20000):
+    """Recompute all strata and samples from archived and hot trips. Returns (population, sampled)."""
+    with write_transaction():
+        TripSample.objects.all().delete()
+        TripStratum.objects.all().delete()
+        for rows in iter_archived_rows(('cab_type', *SAMPLE_FIELDS), chunk_size):
+            add_trips(rows)
+        for rows in hot_batches(TaxiTrip.objects.values('cab_type', *SAMPLE_FIELDS), chunk_size):
+            add_trips(rows)
+    totals = [(s.population, s.sampled) for s in TripStratum.objects.all()]
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
@@ -0,0 +1,202 @@
+"""
+Mergeable quantile sketches (t-digest) for fare, distance, tip and trip duration.
+One sketch per cab_type × day × metric is updated from every ingested batch, so
+percentiles for any date range merge ~200 centroids per day instead of sorting trips.
+"""
+import math
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from .archive import iter_archived_rows
+from .db import write_transaction
+from .models import QuantileSketch, TaxiTrip
+from .sampling import hot_batches
+
+TZ = ZoneInfo('America/New_York')
+
+# t-digest compression: roughly the number of centroids kept per sketch. 100 leaves the
+# p99.9 of trip distance several miles off on a year of trips; 200 keeps it within one.
+COMPRESSION = 200
+
+METRICS = ('fare', 'distance', 'tip', 'duration')
+FIELDS = ('cab_type', 'pickup_datetime', 'dropoff_datetime', 'fare_amount', 'trip_distance', 'tip_amount')
+
+
+def _metric_values(row):
+    """(metric, value) pairs for one trip dict; duration is in minutes."""
+    if row['fare_amount'] is not None:
+        yield 'fare', row['fare_amount']
+    if row['trip_distance'] is not None:
+        yield 'distance', row['trip_distance']
+    if row['tip_amount'] is not None:
+        yield 'tip', row['tip_amount']
+    if row['dropoff_datetime'] is not None:
+        minutes = (row['dropoff_datetime'] - row['pickup_datetime']).total_seconds() / 60
+        if minutes >= 0:
+            yield 'duration', minutes
+
+
+def _k(q):
+    """Arcsine scale function: a centroid may span one unit of k, so fewer trips near the tails."""
+    return COMPRESSION / math.pi * math.asin(2 * q - 1)
+
+
+def _q(k):
+    return (math.sin(min(k, COMPRESSION / 2) * math.pi / COMPRESSION) + 1) / 2
+
+
+class TDigest:
+    """t-digest with the arcsine scale function, merged in sorted order one centroid at a time."""
+
+    def __init__(self, means=None, weights=None, vmin=math.inf, vmax=-math.inf):
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+        self.min = vmin
+        self.max = vmax
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return cls()
+        digest = cls(values, np.ones(len(values)), float(values.min()), float(values.max()))
+        digest._compress()
+        return digest
+
+    @classmethod
+    def from_sketch(cls, sketch):
+        pairs = np.frombuffer(bytes(sketch.centroids), dtype=np.float64).reshape(-1, 2)
+        vmin = sketch.min_value if sketch.min_value is not None else math.inf
+        vmax = sketch.max_value if sketch.max_value is not None else -math.inf
+        return cls(pairs[:, 0], pairs[:, 1], vmin, vmax)
+
+    def to_bytes(self):
+        return np.column_stack([self.means, self.weights]).astype(np.float64).tobytes()
+
+    @property
+    def count(self):
+        return int(round(self.weights.sum()))
+
+    def merge(self, *others):
+        digests = [self, *others]
+        self.means = np.concatenate([d.means for d in digests])
+        self.weights = np.concatenate([d.weights for d in digests])
+        self.min = min(d.min for d in digests)
+        self.max = max(d.max for d in digests)
+        self._compress()
+        return self
+
+    def _compress(self):
+        """
+        Greedily merge sorted centroids while each stays within one unit of k, so none
+        outweighs its share of the tail. The smallest and largest stay singletons.
+        """
+        n = len(self.means)
+        if n <= 2:
+            return
+        order = np.argsort(self.means, kind='stable')
+        means = self.means[order]
+        weights = self.weights[order]
+        cum = np.cumsum(weights)
+        total = cum[-1]
+        starts = [0]
+        i = 1
+        while i < n - 1:
+            limit = total * _q(_k(cum[i - 1] / total) + 1)
+            # items i..j-1 fit under the limit; always take at least one
+            j = min(max(int(np.searchsorted(cum, limit, side='right')), i + 1), n - 1)
+            starts.append(i)
+            i = j
+        starts.append(n - 1)
+        w = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / w
+        self.weights = w
+
+    def quantile(self, q):
+        """
+        Interpolate between centroid midpoints, and from min/max at the ends. Unit-weight
+        centroids are single trips, so they are returned exactly rather than smeared.
+        """
+        n = len(self.means)
+        if not n:
+            return None
+        means, weights = self.means, self.weights
+        total = weights.sum()
+        index = q * total
+        if n == 1:
+            return float(np.interp(index, [0, total / 2, total], [self.min, means[0], self.max]))
+        if index < 1:
+            return float(self.min)
+        if index > total - 1:
+            return float(self.max)
+        if weights[0] > 1 and index < weights[0] / 2:
+            return float(self.min + (index - 1) / (weights[0] / 2 - 1) * (means[0] - self.min))
+        if weights[-1] > 1 and total - index <= weights[-1] / 2:
+            return float(self.max - (total - index - 1) / (weights[-1] / 2 - 1) * (self.max - means[-1]))
+        mids = np.cumsum(weights) - weights / 2
+        i = min(int(np.searchsorted(mids, index, side='right')) - 1, n - 2)
+        left, right = index - mids[i], mids[i + 1] - index
+        if weights[i] == 1:
+            if left < 0.5:
+                return float(means[i])
+            left -= 0.5
+        if weights[i + 1] == 1:
+            if right <= 0.5:
+                return float(means[i + 1])
+            right -= 0.5
+        return float((means[i] * right + means[i + 1] * left) / (left + right))
+
+
+def add_trips(rows):
+    """Fold trip dicts into their cab_type × day sketches. Call inside the ingest transaction."""
+    values = defaultdict(list)
+    for r in rows:
+        day = r['pickup_datetime'].astimezone(TZ).date()
+        for metric, value in _metric_values(r):
+            values[(r['cab_type'], day, metric)].append(value)
+    if not values:
+        return
+    existing = {
+        (s.cab_type, s.day, s.metric): s
+        for s in QuantileSketch.objects.filter(
+            cab_type__in={k[0] for k in values},
+            day__in={k[1] for k in values},
+        )
+    }
+    created, updated = [], []
+    for key, vals in values.items():
+        digest = TDigest.from_values(vals)
+        sketch = existing.get(key)
+        if sketch is None:
+            sketch = QuantileSketch(cab_type=key[0], day=key[1], metric=key[2])
+            created.append(sketch)
+        else:
+            digest = TDigest.from_sketch(sketch).merge(digest)
+            updated.append(sketch)
+        sketch.count = digest.count
+        sketch.min_value = digest.min
+        sketch.max_value = digest.max
+        sketch.centroids = digest.to_bytes()
+    QuantileSketch.objects.bulk_create(created)
+    QuantileSketch.objects.bulk_update(updated, ['count', 'min_value', 'max_value', 'centroids'])
+
+
+def merge_sketches(sketches):
+    """Merge QuantileSketch rows into one TDigest per metric."""
+    parts = defaultdict(list)
+    for s in sketches:
+        parts[s.metric].append(TDigest.from_sketch(s))
+    return {metric: TDigest().merge(*digests) for metric, digests in parts.items()}
+
+
+def rebuild(chunk_size=20000):
+    """Recompute every sketch from archived and hot trips. Returns the number of sketches."""
+    with write_transaction():
+        QuantileSketch.objects.all().delete()
+        for rows in iter_archived_rows(FIELDS, chunk_size):
+            add_trips(rows)
+        for rows in hot_batches(TaxiTrip.objects.values(*FIELDS), chunk_size):
+            add_trips(rows)
+    return QuantileSketch.objects.count()
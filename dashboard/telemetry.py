@@ -0,0 +1,141 @@
+"""
+Ingestion telemetry: per-stage timings, throughput, rejected rows and peak RSS.
+Stages: read (file -> DataFrame), parse (datetimes), coerce (numeric columns),
+dedup (fingerprints + Bloom filter), insert (bulk_create) and index (post-load index statistics).
+"""
+import resource
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+STAGES = ('read', 'parse', 'coerce', 'dedup', 'insert', 'index')
+
+
+def current_rss():
+    """Resident set size of this process in bytes (falls back to peak RSS off Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class IngestStats:
+    """Accumulates telemetry for one file ingest."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.rows = dict.fromkeys(STAGES, 0)
+        self.rows_read = 0
+        self.rows_skipped = 0
+        self.rejected = Counter()
+        self.peak_rss = current_rss()
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, rows)
+            self.sample_rss()
+
+    def add(self, name, seconds, rows=0):
+        self.seconds[name] += seconds
+        self.rows[name] += rows
+
+    def reject(self, reason, n=1):
+        self.rejected[reason] += n
+
+    def sample_rss(self):
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+    def stages_dict(self):
+        out = {}
+        for name in STAGES:
+            secs = self.seconds[name]
+            rows = self.rows[name]
+            out[name] = {
+                'seconds': round(secs, 4),
+                'rows': rows,
+                'rows_per_sec': round(rows / secs, 1) if secs > 0 else None,
+            }
+        return out
+
+
+class MemoryBudgetExceeded(Exception):
+    """Ingest would exceed the configured memory limit."""
+
+
+# Batch sizes used without a limit, and the ceiling with one
+DEFAULT_BATCH_ROWS = {'read': 50000, 'insert': 5000}
+# Smallest batch worth running; below this the budget is too tight to make progress
+MIN_BATCH_ROWS = 500
+# Share of the remaining headroom each stage may hold at once
+BUDGET_SHARE = {'read': 0.4, 'insert': 0.2}
+# Starting per-row footprint guesses (bytes), refined from measured batches
+INITIAL_ROW_BYTES = {'read': 1024, 'insert': 4096}
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value):
+    """Parse '512M', '2G', '1.5GB' or a plain byte count into bytes."""
+    text = str(value).strip().upper().removesuffix('B').removesuffix('I')
+    unit = text[-1:] if text[-1:] in _UNITS else ''
+    try:
+        size = int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+    except ValueError:
+        raise ValueError(f'Invalid memory size: {value!r} (use e.g. 512M or 2G)') from None
+    if size <= 0:
+        raise ValueError(f'Memory size must be positive: {value!r}')
+    return size
+
+
+def format_size(nbytes):
+    return f'{nbytes / 1048576:.0f} MB'
+
+
+class MemoryBudget:
+    """
+    Caps process RSS during an ingest. Read and insert batch sizes are derived from
+    the remaining headroom and the per-row footprint measured on previous batches.
+    limit_bytes=None disables the cap and uses DEFAULT_BATCH_ROWS.
+    """
+
+    def __init__(self, limit_bytes=None):
+        self.limit = limit_bytes or None
+        self.row_bytes = dict(INITIAL_ROW_BYTES)
+        self.check('start')
+
+    def batch_rows(self, kind):
+        default = DEFAULT_BATCH_ROWS[kind]
+        if not self.limit:
+            return default
+        rss = current_rss()
+        rows = int((self.limit - rss) * BUDGET_SHARE[kind] / self.row_bytes[kind])
+        if rows < MIN_BATCH_ROWS:
+            raise MemoryBudgetExceeded(
+                f'Memory limit {format_size(self.limit)} is too tight: RSS is {format_size(rss)} '
+                f'and a {kind} batch of {MIN_BATCH_ROWS} rows needs about '
+                f'{format_size(MIN_BATCH_ROWS * self.row_bytes[kind] / BUDGET_SHARE[kind])} of headroom. '
+                f'Raise --memory-limit / INGEST_MEMORY_LIMIT.'
+            )
+        return min(rows, default)
+
+    def observe(self, kind, rows, nbytes):
+        """Fold the measured footprint of a batch into the per-row estimate."""
+        if rows > 0 and nbytes > 0:
+            self.row_bytes[kind] = max(64.0, 0.5 * self.row_bytes[kind] + 0.5 * nbytes / rows)
+
+    def check(self, stage):
+        if not self.limit:
+            return
+        rss = current_rss()
+        if rss > self.limit:
+            raise MemoryBudgetExceeded(
+                f'Ingest exceeded the memory limit of {format_size(self.limit)} during {stage} '
+                f'(RSS {format_size(rss)}). Raise --memory-limit / INGEST_MEMORY_LIMIT or lower max_rows.'
+            )
@@ -0,0 +1,912 @@
+import base64
+import fcntl
+import io
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.apps import apps
+from django.db import OperationalError, connections, models
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from dashboard import analytics, archive, partitions, perf, sampling, sketches
+from dashboard.archive import closed_months
+from dashboard.db import READ_DB, WRITE_DB, ReadOnlyRouter, WriteLockTimeout, write_transaction
+from dashboard.dedup import BloomFilter, deduplicator
+from dashboard.ingest import file_sha256, ingest_file
+from dashboard.models import IngestRun, QuantileSketch, TaxiTrip, TaxiZone, TripSample, TripStratum
+from dashboard.parsers import parse_csv
+from dashboard.telemetry import IngestStats, MemoryBudget, MemoryBudgetExceeded, current_rss, parse_size
+
+NOW = datetime(2025, 6, 15, tzinfo=timezone.utc)
+TZ = ZoneInfo('America/New_York')
+
+
+def green_trips(n, month=3, seed=0):
+    """n green-format trips spread over a 2025 month, with skewed distances and fares."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, month, 1, tzinfo=TZ)
+    seconds = np.sort(rng.integers(0, 28 * 86400, n))
+    pickup = [start + timedelta(seconds=int(s)) for s in seconds]
+    distance = np.round(rng.lognormal(0.8, 0.9, n), 2)
+    fare = np.round(3 + 2.5 * distance + rng.normal(0, 2, n).clip(-2), 2)
+    tip = np.round(fare * rng.choice([0, 0.15, 0.2], n), 2)
+    return pd.DataFrame({
+        # NYC wall-clock times without an offset, like the TLC files
+        'lpep_pickup_datetime': pd.to_datetime(pickup).tz_localize(None),
+        'lpep_dropoff_datetime': pd.to_datetime([p + timedelta(minutes=4 * d + 3) for p, d in zip(pickup, distance)]).tz_localize(None),
+        'PULocationID': rng.integers(1, 60, n),
+        'DOLocationID': rng.integers(1, 60, n),
+        'passenger_count': rng.integers(1, 4, n).astype(float),
+        'trip_distance': distance,
+        'fare_amount': fare,
+        'tip_amount': tip,
+        'total_amount': np.round(fare + tip + 1, 2),
+        'payment_type': rng.choice([1.0, 2.0], n, p=[0.7, 0.3]),
+    })
+
+
+class TripDataTestCase(TransactionTestCase):
+    """Ingests real files into a file-backed test database; partitions and the cold tier are reset per test."""
+    databases = {'default', 'readonly'}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        override = override_settings(ARCHIVE_DIR=self.tmp / 'archive', PERF_DIR=self.tmp / 'perf')
+        override.enable()
+        self.addCleanup(override.disable)
+        deduplicator.reset()
+        analytics._panel_cache = {}
+        analytics._partition_cache = {}
+        analytics._hour_of_week_cache = {}
+        analytics._hour_of_week_partitions = {}
+        analytics._duration_cache = {}
+
+    def tearDown(self):
+        # Partition tables are not Django models, so the flush between tests leaves them
+        with write_transaction(WRITE_DB):
+            for key in partitions.existing(using=WRITE_DB):
+                partitions.drop(*key, using=WRITE_DB)
+
+    def write(self, df, name):
+        path = self.tmp / name
+        if name.endswith('.parquet'):
+            df.to_parquet(path)
+        else:
+            df.to_csv(path, index=False)
+        return path
+
+    def ingest(self, df, name='green_tripdata_2025-03.parquet', **kwargs):
+        return ingest_file(self.write(df, name), 'green', name=name, origin='command', **kwargs)
+
+
+class ClosedMonthsTests(SimpleTestCase):
+    def test_keeps_newest_loaded_month(self):
+        hot = {('green', 202501): 48000, ('green', 202502): 46000, ('green', 202503): 51000}
+        self.assertEqual(closed_months(keep_months=1, now=NOW, hot=hot), [('green', 202501), ('green', 202502)])
+
+    def test_straggler_partition_is_not_a_loaded_month(self):
+        # The March file lists 3 April pickups; March was just loaded and must stay hot
+        hot = {('green', 202502): 46000, ('green', 202503): 51000, ('green', 202504): 3}
+        self.assertEqual(closed_months(keep_months=1, now=NOW, hot=hot), [('green', 202502)])
+
+    def test_current_month_stays_hot(self):
+        hot = {('yellow', 202505): 90000, ('yellow', 202506): 40000}
+        self.assertEqual(closed_months(keep_months=0, now=NOW, hot=hot), [('yellow', 202505)])
+
+    def test_cab_types_are_independent(self):
+        hot = {('green', 202503): 51000, ('green', 202504): 3, ('yellow', 202503): 90000, ('yellow', 202504): 88000}
+        self.assertEqual(closed_months(keep_months=1, now=NOW, hot=hot), [('yellow', 202503)])
+
+
+class PerfSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        override = override_settings(PERF_DIR=self.dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        perf._samples.clear()
+        perf._flushed_at = 0.0
+
+    def test_record_writes_this_workers_window(self):
+        perf.record('metrics', 12.5, 3, 4.0, 1)
+        saved = pickle.loads((self.dir / f'{os.getpid()}.pickle').read_bytes())
+        self.assertEqual(saved, {'metrics': [(12.5, 3, 4.0, 1)]})
+
+    def test_snapshot_merges_live_workers(self):
+        perf.record('metrics', 10.0, 3, 4.0, 1)
+        other = os.getppid()  # any live process stands in for a sibling worker
+        (self.dir / f'{other}.pickle').write_bytes(pickle.dumps({'metrics': [(30.0, 5, 6.0, 1)], 'heatmap': [(8.0, 1, 2.0, 150)]}))
+        snap = perf.snapshot()
+        self.assertEqual(snap['workers'], sorted([os.getpid(), other]))
+        self.assertEqual(snap['panels']['metrics']['count'], 2)
+        self.assertEqual(snap['panels']['metrics']['wall_ms']['max'], 30.0)
+        self.assertEqual(snap['panels']['heatmap']['rows_avg'], 150)
+
+    def test_snapshot_drops_exited_workers(self):
+        proc = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        stale = self.dir / f'{int(proc.stdout)}.pickle'
+        stale.write_bytes(pickle.dumps({'metrics': [(99.0, 1, 1.0, 1)]}))
+        snap = perf.snapshot()
+        self.assertEqual(snap['workers'], [os.getpid()])
+        self.assertNotIn('metrics', snap['panels'])
+        self.assertFalse(stale.exists())
+
+
+class ParseCsvTests(SimpleTestCase):
+    def csv(self, n, trailing_newline=True):
+        text = green_trips(n).to_csv(index=False)
+        return text if trailing_newline else text.rstrip('\n')
+
+    def test_truncated_file_reports_total_and_skipped(self):
+        stats = IngestStats()
+        rows = list(parse_csv(io.BytesIO(self.csv(25).encode()), 'green', max_rows=10, stats=stats))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual((stats.rows_read, stats.rows_skipped), (25, 15))
+        self.assertEqual(stats.rows['read'], 10)
+
+    def test_path_without_trailing_newline(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.csv(25, trailing_newline=False))
+        self.addCleanup(os.unlink, f.name)
+        stats = IngestStats()
+        self.assertEqual(len(list(parse_csv(f.name, 'green', max_rows=10, stats=stats))), 10)
+        self.assertEqual((stats.rows_read, stats.rows_skipped), (25, 15))
+
+    def test_file_within_limit_skips_nothing(self):
+        stats = IngestStats()
+        rows = list(parse_csv(io.BytesIO(self.csv(25).encode()), 'green', max_rows=100, stats=stats))
+        self.assertEqual(len(rows), 25)
+        self.assertEqual((stats.rows_read, stats.rows_skipped), (25, 0))
+
+    def test_rejected_rows_are_counted_by_reason(self):
+        df = green_trips(20)
+        df['lpep_pickup_datetime'] = df['lpep_pickup_datetime'].astype(str)
+        df.loc[0, 'lpep_pickup_datetime'] = '2024-12-31 23:00:00'
+        df.loc[1, 'lpep_pickup_datetime'] = 'not a date'
+        df.loc[2, 'lpep_pickup_datetime'] = None
+        stats = IngestStats()
+        rows = list(parse_csv(io.StringIO(df.to_csv(index=False)), 'green', stats=stats))
+        self.assertEqual(len(rows), 17)
+        self.assertEqual(dict(stats.rejected), {'outside_2025': 1, 'unparseable_pickup': 1, 'missing_pickup': 1})
+
+
+class IngestTelemetryTests(TripDataTestCase):
+    def test_run_records_stages_and_row_accounting(self):
+        run = self.ingest(green_trips(300), name='green_tripdata_2025-03.csv', max_rows=200)
+        self.assertEqual(run.status, 'ok')
+        self.assertEqual((run.rows_read, run.rows_skipped, run.rows_inserted), (300, 100, 200))
+        self.assertEqual(run.stages['insert']['rows'], 200)
+        self.assertGreater(run.stages['parse']['seconds'], 0)
+        self.assertGreater(run.peak_rss_bytes, 0)
+        self.assertEqual(self.client.get('/api/ingest-runs/?limit=1').json()['runs'][0]['id'], run.id)
+
+    def test_failed_parse_is_recorded(self):
+        path = self.write(green_trips(10).drop(columns='lpep_pickup_datetime'), 'green_tripdata_2025-03.parquet')
+        with self.assertRaises(ValueError):
+            ingest_file(path, 'green', origin='command')
+        run = IngestRun.objects.get()
+        self.assertEqual(run.status, 'failed')
+        self.assertIn('lpep_pickup_datetime', run.error)
+        self.assertFalse(partitions.existing(using=WRITE_DB))
+
+
+class MemoryBudgetTests(SimpleTestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size('512M'), 512 * 1024 ** 2)
+        self.assertEqual(parse_size('1.5GB'), 3 * 1024 ** 3 // 2)
+        self.assertEqual(parse_size('2Gi'), 2 * 1024 ** 3)
+        self.assertEqual(parse_size(4096), 4096)
+        for bad in ('lots', '0', '-1G'):
+            with self.assertRaises(ValueError):
+                parse_size(bad)
+
+    def test_batches_shrink_as_rows_grow(self):
+        budget = MemoryBudget(current_rss() + 200 * 1024 ** 2)
+        before = budget.batch_rows('insert')
+        budget.observe('insert', 1000, 1000 * 40000)
+        self.assertLess(budget.batch_rows('insert'), before)
+
+    def test_unlimited_budget_uses_default_batches(self):
+        self.assertEqual(MemoryBudget().batch_rows('read'), 50000)
+
+    def test_limit_below_rss_fails_at_start(self):
+        with self.assertRaises(MemoryBudgetExceeded):
+            MemoryBudget(current_rss() // 2)
+
+
+class MemoryLimitIngestTests(TripDataTestCase):
+    def test_too_tight_limit_fails_before_inserting(self):
+        with self.assertRaises(MemoryBudgetExceeded):
+            self.ingest(green_trips(100), memory_limit=current_rss() + 1024 ** 2)
+        run = IngestRun.objects.get()
+        self.assertEqual((run.status, run.rows_inserted), ('failed', 0))
+        self.assertIn('too tight', run.error)
+        self.assertFalse(partitions.existing(using=WRITE_DB))
+
+    def test_limit_exceeded_mid_ingest_rolls_back_the_file(self):
+        self.ingest(green_trips(300, month=3), name='green_tripdata_2025-03.parquet')
+        strata_before = sum(TripStratum.objects.values_list('population', flat=True))
+        sketches_before = {(s.day, s.metric): s.count for s in QuantileSketch.objects.all()}
+        check = MemoryBudget.check
+        inserts = []
+
+        def exceed_on_second_insert(budget, stage):
+            if stage == 'insert':
+                inserts.append(stage)
+                if len(inserts) == 2:
+                    raise MemoryBudgetExceeded('Ingest exceeded the memory limit during insert')
+            return check(budget, stage)
+
+        april = green_trips(6000, month=4, seed=1)
+        with mock.patch.object(MemoryBudget, 'check', autospec=True, side_effect=exceed_on_second_insert):
+            with self.assertRaises(MemoryBudgetExceeded):
+                self.ingest(april, name='green_tripdata_2025-04.parquet', max_rows=6000)
+        run = IngestRun.objects.latest('id')
+        self.assertEqual(run.status, 'failed')
+        self.assertEqual(run.stages['insert']['rows'], 6000)  # both batches were written, then rolled back
+        self.assertEqual(partitions.existing(using=WRITE_DB), [('green', 202503)])
+        self.assertEqual(TaxiTrip.objects.count(), 300)
+        self.assertEqual(sum(TripStratum.objects.values_list('population', flat=True)), strata_before)
+        self.assertEqual({(s.day, s.metric): s.count for s in QuantileSketch.objects.all()}, sketches_before)
+        # Nothing of April is left behind, so loading it again inserts every trip
+        run = self.ingest(april, name='green_tripdata_2025-04.parquet', max_rows=6000)
+        self.assertEqual((run.rows_inserted, run.rejected), (6000, {}))
+
+    @override_settings(INGEST_MEMORY_LIMIT='1M')
+    def test_upload_over_limit_returns_413(self):
+        path = self.write(green_trips(50), 'trips.parquet')
+        with open(path, 'rb') as f:
+            response = self.client.post('/api/upload/', {'file': f, 'cab_type': 'green'})
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('memory limit', response.json()['error'])
+
+
+def trip_rows(df, cab_type='green'):
+    """Trip dicts, as ingest hands them to sampling and sketches, from a green_trips() frame."""
+    return [
+        {
+            'cab_type': cab_type,
+            'pickup_datetime': r.lpep_pickup_datetime.to_pydatetime().replace(tzinfo=TZ),
+            'dropoff_datetime': r.lpep_dropoff_datetime.to_pydatetime().replace(tzinfo=TZ),
+            'pulocation_id': int(r.PULocationID),
+            'payment_type': float(r.payment_type),
+            'fare_amount': float(r.fare_amount),
+            'trip_distance': float(r.trip_distance),
+            'tip_amount': float(r.tip_amount),
+        }
+        for r in df.itertuples()
+    ]
+
+
+@override_settings(APPROX_SAMPLE_FRACTION=0.05)
+class ApproxQueryTests(TripDataTestCase):
+    """approx=1 estimates against known populations with a heavy tail."""
+
+    def populate(self, seed, n=5000):
+        df = green_trips(n, seed=seed)
+        # A few corrupt odometer readings dominate the mean distance, as in the TLC files
+        df.loc[[10, n // 3, n // 2, n - 10], 'trip_distance'] = [4500.0, 12000.0, 8000.0, 30000.0]
+        rows = trip_rows(df)
+        with write_transaction():
+            TripSample.objects.all().delete()
+            TripStratum.objects.all().delete()
+            sampling.add_trips(rows)
+        return rows
+
+    def test_mean_estimates_cover_the_exact_means(self):
+        errors = []
+        for seed in range(30):
+            rows = self.populate(seed, n=10000)
+            approx = analytics.get_metrics('green', approx=True)
+            self.assertEqual(approx['total_trips'], len(rows))
+            for field, column in (('avg_fare', 'fare_amount'), ('avg_distance', 'trip_distance')):
+                exact = np.mean([r[column] for r in rows])
+                errors.append(abs(approx[field] - exact) / approx[f'{field}_ci95'])
+        # ~95% of 95% intervals cover the truth; a biased estimator misses by many widths
+        self.assertGreaterEqual(np.mean(np.array(errors) <= 1), 0.85)
+        self.assertLess(max(errors), 3)
+
+    def test_count_estimates_cover_the_exact_counts(self):
+        rows = self.populate(0, n=20000)
+        local = [r['pickup_datetime'].astimezone(TZ) for r in rows]
+        exact = {
+            'trips_over_time': Counter(d.strftime('%Y-%m-%d') for d in local),
+            'trips_by_weekday': Counter(analytics.WEEKDAY_LABELS[d.weekday()] for d in local),
+            'payment_type': Counter(analytics.PAYMENT_LABELS[int(r['payment_type'])] for r in rows),
+        }
+        covered = []
+        for panel, counts in exact.items():
+            approx = getattr(analytics, f'get_{panel}')('green', approx=True)
+            for label, est, ci in zip(approx['labels'], approx['data'], approx['ci95']):
+                covered.append(abs(est - counts[label]) <= ci)
+        self.assertGreater(len(covered), 30)
+        self.assertGreaterEqual(sum(covered) / len(covered), 0.85)
+
+    def test_tail_trips_are_all_sampled(self):
+        self.populate(0)
+        tails = TripSample.objects.filter(tail=True)
+        self.assertEqual(sorted(tails.values_list('trip_distance', flat=True)), [4500.0, 8000.0, 12000.0, 30000.0])
+        self.assertEqual(sum(TripStratum.objects.filter(tail=True).values_list('population', flat=True)), 4)
+
+    def test_ingest_and_rebuild_draw_the_same_sample(self):
+        self.ingest(green_trips(4000), max_rows=4000)
+        sampled = set(TripSample.objects.values_list('pickup_datetime', 'fare_amount'))
+        self.assertAlmostEqual(len(sampled) / 4000, 0.05, delta=0.015)
+        sampling.rebuild()
+        self.assertEqual(set(TripSample.objects.values_list('pickup_datetime', 'fare_amount')), sampled)
+
+
+class TDigestTests(SimpleTestCase):
+    """Sketch quantiles against numpy.percentile on skewed data with a heavy tail."""
+    QUANTILES = (1, 10, 50, 90, 99, 99.9)
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = np.concatenate([
+            rng.lognormal(0.8, 0.9, 100000),
+            rng.pareto(1.5, 1000) * 20,
+            rng.uniform(500, 30000, 30),  # odometer errors
+        ])
+        rng.shuffle(self.values)
+
+    def assertMatchesNumpy(self, digest):
+        self.assertEqual(digest.count, len(self.values))
+        self.assertEqual((digest.min, digest.max), (self.values.min(), self.values.max()))
+        for q, exact in zip(self.QUANTILES, np.percentile(self.values, self.QUANTILES)):
+            estimate = digest.quantile(q / 100)
+            with self.subTest(q=q):
+                # within 0.02% of rank everywhere; in value, the sparse top 0.1% is coarser
+                self.assertAlmostEqual(np.mean(self.values <= estimate), q / 100, delta=0.0002)
+                self.assertLess(abs(estimate - exact) / exact, 0.01 if q < 99.9 else 0.25)
+
+    def test_one_build(self):
+        self.assertMatchesNumpy(sketches.TDigest.from_values(self.values))
+
+    def test_repeated_batch_merges(self):
+        digest = sketches.TDigest()
+        for batch in np.array_split(self.values, 20):
+            digest.merge(sketches.TDigest.from_values(batch))
+        self.assertMatchesNumpy(digest)
+
+    def test_merge_of_many_sketches(self):
+        days = [sketches.TDigest.from_values(batch) for batch in np.array_split(self.values, 30)]
+        self.assertMatchesNumpy(sketches.TDigest().merge(*days))
+
+    def test_extremes_stay_singletons(self):
+        digest = sketches.TDigest.from_values(self.values)
+        self.assertEqual((digest.weights[0], digest.weights[-1]), (1, 1))
+        self.assertEqual(digest.means[-1], self.values.max())
+        self.assertLessEqual(len(digest.means), 2 * sketches.COMPRESSION)
+
+
+class SketchIngestTests(TripDataTestCase):
+    def test_percentiles_match_numpy_after_batched_ingest(self):
+        df = green_trips(30000, seed=3)
+        df.loc[[10, 9000, 20000, 29000], 'trip_distance'] = [4500.0, 12000.0, 8000.0, 30000.0]
+        rows = trip_rows(df)
+        for start in range(0, len(rows), 5000):
+            with write_transaction():
+                sketches.add_trips(rows[start:start + 5000])
+        result = analytics.get_percentiles('green', quantiles=(50, 90, 99, 99.9))['metrics']
+        for metric, column in (('distance', 'trip_distance'), ('fare', 'fare_amount')):
+            values = df[column].to_numpy()
+            self.assertEqual(result[metric]['count'], len(values))
+            for q, exact in zip((50, 90, 99, 99.9), np.percentile(values, (50, 90, 99, 99.9))):
+                with self.subTest(metric=metric, q=q):
+                    self.assertLess(abs(result[metric][f'p{q:g}'] - exact) / exact, 0.03)
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_and_about_the_target_false_positive_rate(self):
+        rng = np.random.default_rng(0)
+        stored, other = np.split(rng.integers(-2 ** 63, 2 ** 63 - 1, 200000, dtype=np.int64), 2)
+        bloom = BloomFilter(len(stored))
+        bloom.add(stored)
+        self.assertTrue(bloom.might_contain(stored).all())
+        self.assertLess(bloom.might_contain(other).mean(), 0.02)
+
+
+class DedupIngestTests(TripDataTestCase):
+    def test_reingesting_a_file_skips_every_trip(self):
+        df = green_trips(2000)
+        first = self.ingest(df)
+        again = self.ingest(df)
+        self.assertEqual(first.rows_inserted, 2000)
+        self.assertEqual((again.rows_inserted, again.rejected), (0, {'duplicate': 2000}))
+        self.assertEqual(TaxiTrip.objects.count(), 2000)
+        self.assertEqual(sum(TripStratum.objects.values_list('population', flat=True)), 2000)
+
+    def test_overlapping_file_inserts_only_new_trips(self):
+        df = green_trips(2000)
+        self.ingest(df.iloc[:1500])
+        run = self.ingest(df.iloc[1000:], name='green_tripdata_2025-03b.parquet')
+        self.assertEqual((run.rows_inserted, run.rejected), (500, {'duplicate': 500}))
+        self.assertEqual(TaxiTrip.objects.count(), 2000)
+
+    def test_repeats_within_a_file_are_dropped(self):
+        df = green_trips(1000)
+        run = self.ingest(pd.concat([df, df.iloc[:100]]))
+        self.assertEqual((run.rows_inserted, run.rejected), (1000, {'duplicate': 100}))
+
+    def test_built_filter_and_index_lookups_agree(self):
+        df = green_trips(2000)
+        self.ingest(df.iloc[:1500])
+        deduplicator.warm()  # as in the gunicorn master; later batches go through the filter
+        run = self.ingest(df.iloc[1000:], name='green_tripdata_2025-03b.parquet')
+        self.assertEqual((run.rows_inserted, run.rejected), (500, {'duplicate': 500}))
+        self.assertEqual(len(set(TaxiTrip.objects.values_list('fingerprint', flat=True))), 2000)
+
+    def test_upload_reports_duplicates(self):
+        path = self.write(green_trips(300), 'trips.csv')
+        for expected in ((300, 0), (0, 300)):
+            with open(path, 'rb') as f:
+                body = self.client.post('/api/upload/', {'file': f, 'cab_type': 'green'}).json()
+            self.assertEqual((body['uploaded'], body['duplicates']), expected)
+
+
+class StartupTests(SimpleTestCase):
+    def test_loading_the_app_skips_heavy_imports(self):
+        script = (
+            'import os, sys, django\n'
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nyc_taxi_dashboard.settings')\n"
+            'django.setup()\n'
+            'import nyc_taxi_dashboard.urls, nyc_taxi_dashboard.wsgi\n'
+            "print(','.join(m for m in ('numpy', 'pandas', 'pyarrow', 'sklearn') if m in sys.modules))\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent.parent,
+        )
+        self.assertEqual(proc.stdout.strip(), '')
+
+
+class WarmCachesTests(TripDataTestCase):
+    def test_warm_caches_loads_zones_once(self):
+        self.addCleanup(setattr, analytics, '_zone_cache', None)
+        analytics._zone_cache = None
+        TaxiZone.objects.bulk_create(TaxiZone(location_id=i, zone=f'Zone {i}') for i in range(1, 4))
+        self.assertEqual(analytics.warm_caches(), 3)
+        self.assertIn('dashboard.ingest', sys.modules)
+        with CaptureQueriesContext(connections[WRITE_DB]) as queries:
+            self.assertEqual(analytics._zones()[2].zone, 'Zone 2')
+        self.assertEqual(len(queries), 0)
+
+
+class ConnectionTuningTests(TripDataTestCase):
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_on_each_connection(self):
+        writer = connections[WRITE_DB]
+        self.assertEqual(self.pragma(writer, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(writer, 'synchronous'), 1)  # NORMAL
+        for alias in (WRITE_DB, READ_DB):
+            with self.subTest(alias=alias):
+                self.assertEqual(self.pragma(connections[alias], 'mmap_size'), settings.SQLITE_MMAP_SIZE)
+                self.assertEqual(self.pragma(connections[alias], 'cache_size'), -settings.SQLITE_CACHE_KB)
+
+    def test_read_only_connection_rejects_writes(self):
+        # Tests mirror the readonly alias onto the writable test database, so open one as
+        # settings.DATABASES does for the real file
+        params = dict(connections[WRITE_DB].settings_dict)
+        params['NAME'] = Path(params['NAME']).as_uri() + '?mode=ro'
+        reader = DatabaseWrapper(params, alias=READ_DB)
+        self.addCleanup(reader.close)
+        self.assertEqual(self.pragma(reader, 'mmap_size'), settings.SQLITE_MMAP_SIZE)
+        with self.assertRaisesMessage(OperationalError, 'readonly'), reader.cursor() as cursor:
+            cursor.execute('DELETE FROM dashboard_ingestrun')
+
+    def test_reads_see_committed_ingests(self):
+        self.ingest(green_trips(200))
+        self.assertEqual(analytics.get_metrics('green')['total_trips'], 200)
+        self.assertEqual(TaxiTrip.objects.using(READ_DB).count(), 200)
+
+    def test_migrations_stay_off_the_read_only_alias(self):
+        router = ReadOnlyRouter()
+        self.assertIs(router.allow_migrate(READ_DB, 'dashboard'), False)
+        self.assertIsNone(router.allow_migrate(WRITE_DB, 'dashboard'))
+
+
+class ExportTests(TripDataTestCase):
+    """/api/export/ against the ingested frames, with March archived and April hot."""
+
+    def setUp(self):
+        super().setUp()
+        self.march = green_trips(600, month=3, seed=1)
+        self.april = green_trips(400, month=4, seed=2)
+        self.ingest(self.march, name='green_tripdata_2025-03.parquet')
+        self.ingest(self.april, name='green_tripdata_2025-04.parquet')
+        archive.archive_partition('green', 202503)
+
+    def expected(self, start=None, end=None, zones=None):
+        df = pd.concat([self.march, self.april])
+        local = df.lpep_pickup_datetime.dt.date
+        keep = pd.Series(True, index=df.index)
+        if start:
+            keep &= local >= start
+        if end:
+            keep &= local <= end
+        if zones:
+            keep &= df.PULocationID.isin(zones)
+        df = df[keep]
+        pickup = df.lpep_pickup_datetime.dt.tz_localize(TZ).dt.tz_convert('UTC')
+        return sorted(zip(pickup, df.fare_amount, df.trip_distance, df.PULocationID))
+
+    def export(self, query):
+        response = self.client.get(f'/api/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        if 'format=csv' in query:
+            df = pd.read_csv(io.BytesIO(body), parse_dates=['pickup_datetime'])
+        else:
+            df = pq.read_table(io.BytesIO(body)).to_pandas()
+        self.assertEqual(list(df.columns[:3]), ['cab_type', 'pickup_datetime', 'dropoff_datetime'])
+        self.assertTrue(df.pickup_datetime.is_monotonic_increasing)
+        pickup = pd.to_datetime(df.pickup_datetime, utc=True)
+        return sorted(zip(pickup, df.fare_amount, df.trip_distance, df.pulocation_id))
+
+    def test_round_trip_across_hot_and_cold(self):
+        self.assertEqual(partitions.existing(using=WRITE_DB), [('green', 202504)])
+        for fmt in ('parquet', 'csv'):
+            with self.subTest(format=fmt):
+                self.assertEqual(self.export(f'format={fmt}&cab_type=green'), self.expected())
+
+    def test_filters_apply_to_both_tiers(self):
+        start, end, zones = datetime(2025, 3, 20).date(), datetime(2025, 4, 3).date(), [5, 6, 7]
+        query = f'cab_type=green&start={start}&end={end}&zones=5,6,7'
+        expected = self.expected(start, end, zones)
+        self.assertTrue(expected)
+        for fmt in ('parquet', 'csv'):
+            with self.subTest(format=fmt):
+                self.assertEqual(self.export(f'format={fmt}&{query}'), expected)
+
+    def test_single_tier_and_empty_exports(self):
+        for query, expected in (
+            ('end=2025-03-31', self.expected(end=datetime(2025, 3, 31).date())),
+            ('start=2025-04-01', self.expected(start=datetime(2025, 4, 1).date())),
+            ('cab_type=yellow', []),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.export(f'format=parquet&{query}'), expected)
+
+    def test_rejects_bad_parameters(self):
+        for query in ('format=xlsx', 'start=2025-13-01', 'zones=a', 'cab_type=blue'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/export/?{query}').status_code, 400)
+
+
+class ArchiveTests(TripDataTestCase):
+    PANELS = (
+        'metrics', 'trips_over_time', 'trips_by_hour', 'trips_by_weekday', 'payment_type', 'heatmap',
+        'hour_of_week_heatmap', 'demand_predictions', 'duration_predictions', 'cluster_zones',
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.ingest(green_trips(600, month=3, seed=1), name='green_tripdata_2025-03.parquet')
+        self.ingest(green_trips(400, month=4, seed=2), name='green_tripdata_2025-04.parquet')
+        yellow = green_trips(300, month=3, seed=3).rename(columns={
+            'lpep_pickup_datetime': 'tpep_pickup_datetime', 'lpep_dropoff_datetime': 'tpep_dropoff_datetime',
+        })
+        path = self.write(yellow, 'yellow_tripdata_2025-03.parquet')
+        ingest_file(path, 'yellow', origin='command')
+
+    def panels(self):
+        return {
+            (name, cab): getattr(analytics, f'get_{name}')(cab)
+            for name in self.PANELS for cab in ('all', 'green', 'yellow')
+        }
+
+    def test_panels_are_unchanged_by_archiving(self):
+        before = self.panels()
+        call_command('archive_months', keep_months=1, stdout=io.StringIO())
+        self.assertEqual(archive.archived_months(), {('green', 202503)})
+        self.assertEqual(sorted(partitions.existing(using=WRITE_DB)), [('green', 202504), ('yellow', 202503)])
+        after = self.panels()
+        for key in before:
+            with self.subTest(panel=key):
+                self.assertEqual(after[key], before[key])
+
+    def test_samples_and_sketches_rebuild_from_both_tiers(self):
+        population = sum(TripStratum.objects.values_list('population', flat=True))
+        counts = {(s.cab_type, s.day, s.metric): s.count for s in QuantileSketch.objects.all()}
+        archive.archive_partition('green', 202503)
+        self.assertEqual(sampling.rebuild()[0], population)
+        sketches.rebuild()
+        self.assertEqual({(s.cab_type, s.day, s.metric): s.count for s in QuantileSketch.objects.all()}, counts)
+
+    def test_archived_month_is_not_reopened_by_ingest(self):
+        archive.archive_partition('green', 202503)
+        run = self.ingest(green_trips(50, month=3, seed=9), name='green_tripdata_2025-03b.parquet')
+        self.assertEqual((run.rows_inserted, run.rejected), (0, {'archived_month': 50}))
+        self.assertNotIn(('green', 202503), partitions.existing(using=WRITE_DB))
+
+
+class PartitionTests(TripDataTestCase):
+    def test_trips_route_to_their_local_pickup_month(self):
+        df = green_trips(10, month=3)
+        # 23:30 on March 31 in New York is already April in UTC
+        df.loc[0, 'lpep_pickup_datetime'] = pd.Timestamp('2025-03-31 23:30')
+        df.loc[1, 'lpep_pickup_datetime'] = pd.Timestamp('2025-04-01 00:30')
+        self.ingest(df)
+        self.assertEqual(partitions.existing(using=WRITE_DB), [('green', 202503), ('green', 202504)])
+        self.assertEqual(partitions.model('green', 202503).objects.count(), 9)
+        self.assertEqual(partitions.model('green', 202504).objects.count(), 1)
+
+    def test_view_is_rebuilt_on_create_and_drop(self):
+        self.ingest(green_trips(300, month=3), name='green_tripdata_2025-03.parquet')
+        self.ingest(green_trips(200, month=4, seed=1), name='green_tripdata_2025-04.parquet')
+        ids = list(TaxiTrip.objects.order_by('pickup_datetime').values_list('id', flat=True))
+        # one sequence across partitions (it carries over from earlier tests' dropped tables)
+        self.assertEqual(ids, list(range(ids[0], ids[0] + 500)))
+        self.assertEqual(TaxiTrip.objects.using(READ_DB).count(), 500)
+
+        version = partitions.data_version()
+        with write_transaction():
+            self.assertEqual(partitions.drop('green', 202503), 300)
+        self.assertNotEqual(partitions.data_version(), version)
+        self.assertEqual(TaxiTrip.objects.count(), 200)
+        self.ingest(green_trips(100, month=5, seed=2), name='green_tripdata_2025-05.parquet')
+        self.assertEqual(TaxiTrip.objects.filter(id__lte=ids[-1]).count(), 200)  # dropped ids are not reused
+        self.assertEqual(TaxiTrip.objects.count(), 300)
+
+        with write_transaction():
+            partitions.drop_outside(202601, 202612)
+        self.assertEqual(partitions.existing(using=WRITE_DB), [])
+        self.assertEqual(TaxiTrip.objects.count(), 0)
+
+    def test_pruning_by_cab_type_and_month(self):
+        self.ingest(green_trips(50, month=3), name='green_tripdata_2025-03.parquet')
+        self.ingest(green_trips(50, month=4, seed=1), name='green_tripdata_2025-04.parquet')
+        with write_transaction():
+            partitions.create('yellow', 202504)
+        self.assertEqual(partitions.pruned('green', 202504), [('green', 202504)])
+        self.assertEqual(partitions.pruned('all', 202504), [('green', 202504), ('yellow', 202504)])
+        self.assertEqual(partitions.pruned('yellow', None, 202503), [])
+        self.assertEqual([qs.count() for qs in partitions.querysets('green')], [50, 50])
+
+    def test_alter_partitions_changes_every_table_and_the_view(self):
+        self.ingest(green_trips(20, month=3), name='green_tripdata_2025-03.parquet')
+        self.ingest(green_trips(20, month=4, seed=1), name='green_tripdata_2025-04.parquet')
+        field = models.FloatField(null=True, blank=True)
+        field.set_attributes_from_name('tip_ratio')
+        connection = connections[WRITE_DB]
+        with connection.schema_editor() as editor:
+            partitions.alter_partitions(apps, editor, lambda mdl: editor.add_field(mdl, field))
+        with connection.cursor() as cursor:
+            for key in partitions.existing(using=WRITE_DB):
+                columns = [c.name for c in connection.introspection.get_table_description(cursor, partitions.table_name(*key))]
+                self.assertIn('tip_ratio', columns)
+            cursor.execute(f'SELECT count(tip_ratio), count(*) FROM {partitions.VIEW}')
+            self.assertEqual(cursor.fetchone(), (0, 40))
+
+
+class PanelCacheTests(TripDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ingest(green_trips(400, month=3, seed=1), name='green_tripdata_2025-03.parquet')
+        yellow = green_trips(300, month=3, seed=2).rename(columns={
+            'lpep_pickup_datetime': 'tpep_pickup_datetime', 'lpep_dropoff_datetime': 'tpep_dropoff_datetime',
+        })
+        ingest_file(self.write(yellow, 'yellow_tripdata_2025-03.parquet'), 'yellow', origin='command')
+        # Zones are cached once loaded; without any, every zone lookup queries again
+        TaxiZone.objects.bulk_create(TaxiZone(location_id=i, lat=40.7 + i / 1000) for i in range(1, 60))
+        analytics._zone_cache = None
+        self.addCleanup(setattr, analytics, '_zone_cache', None)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connections[READ_DB]) as read, CaptureQueriesContext(connections[WRITE_DB]) as write:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(read) + len(write)
+
+    def test_cache_hit_reads_the_data_version_once(self):
+        _, cold = self.queries('/api/dashboard/?cab_type=green')
+        self.assertGreater(cold, 1)
+        response, warm = self.queries('/api/dashboard/?cab_type=green')
+        self.assertEqual(warm, 1)
+        self.assertIn('metrics;dur=', response['Server-Timing'])
+        self.assertEqual(self.queries('/api/metrics/?cab_type=green')[1], 1)
+
+    def test_one_pass_serves_every_cab_filter(self):
+        self.client.get('/api/dashboard/?cab_type=all')
+        with analytics.request_scope(), mock.patch.object(
+            partitions, 'data_version', wraps=partitions.data_version,
+        ) as version:
+            metrics = {cab: analytics.get_metrics(cab) for cab in ('all', 'green', 'yellow')}
+            analytics.get_trips_by_hour('yellow')
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual([metrics[c]['total_trips'] for c in ('all', 'green', 'yellow')], [700, 400, 300])
+
+    def test_panels_refresh_after_an_ingest(self):
+        self.assertEqual(self.client.get('/api/dashboard/?cab_type=green').json()['metrics']['total_trips'], 400)
+        self.ingest(green_trips(100, month=4, seed=3), name='green_tripdata_2025-04.parquet')
+        data = self.client.get('/api/dashboard/?cab_type=green').json()
+        self.assertEqual(data['metrics']['total_trips'], 500)
+        self.assertEqual(sum(data['trips_by_hour']['data']), 500)
+
+
+class HourOfWeekTests(TripDataTestCase):
+    def setUp(self):
+        super().setUp()
+        green = green_trips(500, month=3, seed=1)
+        # Either side of the spring-forward gap on Sunday March 9: hours 1 and 3 of day 6
+        green.loc[0, 'lpep_pickup_datetime'] = pd.Timestamp('2025-03-09 01:30')
+        green.loc[1, 'lpep_pickup_datetime'] = pd.Timestamp('2025-03-09 03:30')
+        # and the only green trips in zone 58
+        green.loc[green['PULocationID'] == 58, 'PULocationID'] = 57
+        green.loc[[0, 1], 'PULocationID'] = 58
+        self.ingest(green, name='green_tripdata_2025-03.parquet')
+        april = green_trips(300, month=4, seed=2)
+        april.loc[april['PULocationID'] == 58, 'PULocationID'] = 57
+        self.ingest(april, name='green_tripdata_2025-04.parquet')
+        yellow = green_trips(200, month=3, seed=3).rename(columns={
+            'lpep_pickup_datetime': 'tpep_pickup_datetime', 'lpep_dropoff_datetime': 'tpep_dropoff_datetime',
+        })
+        ingest_file(self.write(yellow, 'yellow_tripdata_2025-03.parquet'), 'yellow', origin='command')
+        # Zone 59 is left out: its trips have no row in the tensor
+        TaxiZone.objects.bulk_create(TaxiZone(location_id=i, lat=40.7 + i / 1000) for i in range(1, 59))
+        analytics._zone_cache = None
+        self.addCleanup(setattr, analytics, '_zone_cache', None)
+
+    def expected(self, cab):
+        """Dense zone × 168 counts straight from the stored trips."""
+        dense = np.zeros((58, 168), dtype=np.int64)
+        trips = TaxiTrip.objects.filter(pulocation_id__lt=59)
+        if cab != 'all':
+            trips = trips.filter(cab_type=cab)
+        for zone, pickup in trips.values_list('pulocation_id', 'pickup_datetime'):
+            local = pickup.astimezone(TZ)
+            dense[zone - 1, local.weekday() * 24 + local.hour] += 1
+        return dense
+
+    def decode(self, payload):
+        counts = np.frombuffer(base64.b64decode(payload['counts']), dtype=np.dtype(payload['dtype']).newbyteorder('<'))
+        return counts.reshape(payload['shape'])
+
+    def test_counts_by_zone_and_local_hour_of_week(self):
+        for cab in ('all', 'green', 'yellow'):
+            with self.subTest(cab=cab):
+                payload = self.client.get(f'/api/heatmap/hour-of-week/?cab_type={cab}').json()
+                self.assertEqual(payload['zones']['location_id'], list(range(1, 59)))
+                self.assertEqual(payload['shape'], [58, 168])
+                self.assertEqual(payload['dtype'], 'uint16')
+                dense = self.decode(payload)
+                np.testing.assert_array_equal(dense, self.expected(cab))
+                self.assertEqual((payload['total'], payload['max']), (int(dense.sum()), int(dense.max())))
+        dense = self.decode(analytics.get_hour_of_week_heatmap('green'))
+        self.assertEqual(np.flatnonzero(dense[57]).tolist(), [6 * 24 + 1, 6 * 24 + 3])
+
+    def test_unknown_cab_type_is_empty(self):
+        payload = analytics.get_hour_of_week_heatmap('fhv')
+        self.assertEqual(payload['shape'], [58, 168])
+        self.assertEqual(payload['total'], 0)
+        self.assertFalse(self.decode(payload).any())
+
+    def test_unchanged_by_archiving(self):
+        before = {cab: self.expected(cab) for cab in ('all', 'green', 'yellow')}
+        call_command('archive_months', keep_months=1, stdout=io.StringIO())
+        self.assertEqual(archive.archived_months(), {('green', 202503)})
+        for cab, expected in before.items():
+            with self.subTest(cab=cab):
+                np.testing.assert_array_equal(self.decode(analytics.get_hour_of_week_heatmap(cab)), expected)
+
+    def test_rebuilt_only_when_the_data_changes(self):
+        payload = analytics.get_hour_of_week_heatmap('green')
+        with mock.patch('dashboard.aggregates.hour_of_week_from_table') as build:
+            self.assertIs(analytics.get_hour_of_week_heatmap('green'), payload)
+        build.assert_not_called()
+        self.ingest(green_trips(100, month=5, seed=4), name='green_tripdata_2025-05.parquet')
+        self.assertEqual(analytics.get_hour_of_week_heatmap('green')['total'], self.expected('green').sum())
+        self.assertEqual(analytics.get_hour_of_week_heatmap('all')['total'], self.expected('all').sum())
+
+
+class WriteLockTests(TripDataTestCase):
+    @contextmanager
+    def other_writer(self):
+        """Hold the write lock as another process would (flock is per open file)."""
+        with open(f"{connections[WRITE_DB].settings_dict['NAME']}.lock", 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def test_concurrent_writers_in_two_processes(self):
+        watch_dir = self.tmp / 'watch'
+        watch_dir.mkdir()
+        green_trips(20000, month=4, seed=1).to_parquet(watch_dir / 'green_tripdata_2025-04.parquet')
+        env = dict(os.environ, DB_PATH=connections[WRITE_DB].settings_dict['NAME'])
+        watcher = subprocess.Popen(
+            [sys.executable, 'manage.py', 'ingest_watch', '--once', '--settle', '0', '--data-dir', str(watch_dir)],
+            cwd=Path(__file__).resolve().parent.parent, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+        self.addCleanup(watcher.kill)
+        # Upload small files until the watcher has loaded its file, so the two writers overlap
+        uploads = 0
+        while watcher.poll() is None and uploads < 200:
+            path = self.write(green_trips(200, month=3, seed=10 + uploads), f'trips{uploads}.csv')
+            with open(path, 'rb') as f:
+                response = self.client.post('/api/upload/', {'file': f, 'cab_type': 'green'})
+            self.assertEqual(response.status_code, 200, response.content)
+            uploads += 1
+        output = watcher.communicate(timeout=120)[0].decode()
+        self.assertEqual(watcher.returncode, 0, output)
+        self.assertIn('Loaded 20000 green trips', output)
+        self.assertGreater(uploads, 1)
+        self.assertEqual(set(IngestRun.objects.values_list('status', flat=True)), {'ok'})
+        self.assertEqual(TaxiTrip.objects.count(), 20000 + 200 * uploads)
+
+    @override_settings(DB_BUSY_TIMEOUT=0.2)
+    def test_upload_returns_503_while_another_writer_holds_the_lock(self):
+        path = self.write(green_trips(50), 'trips.parquet')
+        with self.other_writer(), open(path, 'rb') as f:
+            response = self.client.post('/api/upload/', {'file': f, 'cab_type': 'green'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertIn('busy', response.json()['error'])
+        self.assertFalse(IngestRun.objects.exists())
+        self.assertFalse(partitions.existing(using=WRITE_DB))
+
+    @override_settings(DB_BUSY_TIMEOUT=0.2)
+    def test_vacuum_waits_for_the_lock(self):
+        with self.other_writer(), self.assertRaises(WriteLockTimeout):
+            archive.vacuum()
+        archive.vacuum()
+
+
+class IngestWatchTests(TripDataTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data_dir = self.tmp / 'data'
+        self.data_dir.mkdir()
+
+    def watch(self):
+        out = io.StringIO()
+        call_command('ingest_watch', once=True, settle=0, data_dir=str(self.data_dir), stdout=out)
+        return out.getvalue()
+
+    def test_skips_files_loaded_before_by_hash(self):
+        path = self.data_dir / 'green_tripdata_2025-03.parquet'
+        green_trips(200).to_parquet(path)
+        self.assertIn('Loaded 200 green trips', self.watch())
+        # A restarted watcher, and one that sees only a new mtime, skip the same content
+        self.assertNotIn('Loaded', self.watch())
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+        self.assertNotIn('Loaded', self.watch())
+        self.assertEqual(IngestRun.objects.count(), 1)
+        green_trips(300, seed=1).to_parquet(path)
+        self.assertIn('Loaded 300 green trips', self.watch())
+        self.assertEqual(TaxiTrip.objects.count(), 500)
+
+    def test_skips_files_loaded_by_load_sample(self):
+        path = self.data_dir / 'green_tripdata_2025-03.parquet'
+        green_trips(100).to_parquet(path)
+        ingest_file(path, 'green', name=path.name, origin='load_sample', file_hash=file_sha256(path))
+        self.assertNotIn('Loaded', self.watch())
+        self.assertEqual(IngestRun.objects.count(), 1)
+
+    def test_ignores_unrelated_and_unsupported_files(self):
+        (self.data_dir / 'notes.csv').write_text('a,b\n1,2\n')
+        green_trips(10).to_parquet(self.data_dir / 'fhv_tripdata_2025-03.parquet')
+        self.assertIn('unsupported cab type', self.watch())
+        self.assertFalse(IngestRun.objects.exists())
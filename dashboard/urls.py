@@ -11,10 +11,16 @@ urlpatterns = [
     path('trips-by-weekday/', views.trips_by_weekday),
     path('payment-type/', views.payment_type),
     path('heatmap/', views.heatmap),
+    path('heatmap/hour-of-week/', views.hour_of_week_heatmap),
     path('demand-predictions/', views.demand_predictions),
     path('cluster-zones/', views.cluster_zones),
     path('duration-predictions/', views.duration_predictions),
+    path('percentiles/', views.percentiles),
+    path('export/', views.export),
     path('dashboard/', views.dashboard_all),
     path('upload/', views.upload),
     path('load-sample/', views.load_sample),
+    path('ingest-runs/', views.ingest_runs),
+    path('archive/', views.archived_partitions),
+    path('_perf/', views.perf_stats),
 ]
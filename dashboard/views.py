@@ -1,89 +1,166 @@
 """
 API views for NYC Taxi Dashboard.
 """
-from datetime import datetime
+from datetime import date
 from pathlib import Path
-from zoneinfo import ZoneInfo
 
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 
-from . import analytics
-from .models import TaxiTrip
-from .parsers import parse_parquet, parse_csv
+from . import analytics, partitions, perf
+from .db import WriteLockTimeout
+from .models import ArchivedPartition, IngestRun
+from .telemetry import MemoryBudgetExceeded
 
 
 def _cab_type(request):
     return request.GET.get('cab_type', 'all') or 'all'
 
 
+def _approx(request):
+    """approx=1: answer counting and average panels from the stratified samples."""
+    return request.GET.get('approx', '') in ('1', 'true')
+
+
+def _panel_response(request, name, func, **kwargs):
+    """Run one instrumented analytics panel and return it with a Server-Timing header."""
+    timer = perf.RequestTimer()
+    with analytics.request_scope():
+        data = timer.run(name, func, _cab_type(request), **kwargs)
+    return timer.annotate(JsonResponse(data))
+
+
 @require_http_methods(["GET"])
 def metrics(request):
-    return JsonResponse(analytics.get_metrics(_cab_type(request)))
+    return _panel_response(request, 'metrics', analytics.get_metrics, approx=_approx(request))
 
 
 @require_http_methods(["GET"])
 def trips_over_time(request):
-    return JsonResponse(analytics.get_trips_over_time(_cab_type(request)))
+    return _panel_response(request, 'trips_over_time', analytics.get_trips_over_time, approx=_approx(request))
 
 
 @require_http_methods(["GET"])
 def trips_by_hour(request):
-    return JsonResponse(analytics.get_trips_by_hour(_cab_type(request)))
+    return _panel_response(request, 'trips_by_hour', analytics.get_trips_by_hour, approx=_approx(request))
 
 
 @require_http_methods(["GET"])
 def trips_by_weekday(request):
-    return JsonResponse(analytics.get_trips_by_weekday(_cab_type(request)))
+    return _panel_response(request, 'trips_by_weekday', analytics.get_trips_by_weekday, approx=_approx(request))
 
 
 @require_http_methods(["GET"])
 def payment_type(request):
-    return JsonResponse(analytics.get_payment_type(_cab_type(request)))
+    return _panel_response(request, 'payment_type', analytics.get_payment_type, approx=_approx(request))
 
 
 @require_http_methods(["GET"])
 def heatmap(request):
-    return JsonResponse(analytics.get_heatmap(_cab_type(request)))
+    return _panel_response(request, 'heatmap', analytics.get_heatmap, approx=_approx(request))
+
+
+@require_http_methods(["GET"])
+def hour_of_week_heatmap(request):
+    return _panel_response(request, 'hour_of_week_heatmap', analytics.get_hour_of_week_heatmap)
 
 
 @require_http_methods(["GET"])
 def demand_predictions(request):
-    return JsonResponse(analytics.get_demand_predictions(_cab_type(request)))
+    return _panel_response(request, 'demand_predictions', analytics.get_demand_predictions)
 
 
 @require_http_methods(["GET"])
 def cluster_zones(request):
-    return JsonResponse(analytics.get_cluster_zones(_cab_type(request)))
+    return _panel_response(request, 'cluster_zones', analytics.get_cluster_zones)
 
 
 @require_http_methods(["GET"])
 def duration_predictions(request):
-    return JsonResponse(analytics.get_duration_predictions(_cab_type(request)))
+    return _panel_response(request, 'duration_predictions', analytics.get_duration_predictions)
+
+
+@require_http_methods(["GET"])
+def percentiles(request):
+    """p50/p90/p99 (or ?q=...) of fare, distance, tip and duration over ?start=&end= (YYYY-MM-DD)."""
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+        quantiles = tuple(float(q) for q in request.GET.get('q', '50,90,99').split(','))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if any(not 0 <= q <= 100 for q in quantiles):
+        return JsonResponse({'error': 'q values must be between 0 and 100'}, status=400)
+    return _panel_response(
+        request, 'percentiles', analytics.get_percentiles,
+        start=start, end=end, quantiles=quantiles, group_by_month=request.GET.get('group') == 'month',
+    )
+
+
+@require_http_methods(["GET"])
+def export(request):
+    """
+    Stream trips as ?format=parquet (default) or csv, filtered by cab_type,
+    ?start=&end= (YYYY-MM-DD pickup dates, inclusive) and ?zones= (pickup location ids).
+    """
+    # pulls in pyarrow; loaded on first export
+    from .export import CONTENT_TYPES, export_batches, stream_csv, stream_parquet
+
+    fmt = request.GET.get('format', 'parquet')
+    if fmt not in CONTENT_TYPES:
+        return JsonResponse({'error': 'format must be parquet or csv'}, status=400)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+        zones = [int(z) for z in request.GET.get('zones', '').split(',') if z.strip()]
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    cab = _cab_type(request)
+    if cab not in ('all', 'yellow', 'green'):
+        return JsonResponse({'error': 'cab_type must be all, yellow or green'}, status=400)
+    batches = export_batches(cab, start, end, zones)
+    stream = stream_parquet(batches) if fmt == 'parquet' else stream_csv(batches)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[fmt])
+    span = '_'.join(d.isoformat() for d in (start, end) if d)
+    filename = f"trips_{cab}{'_' + span if span else ''}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 @require_http_methods(["GET"])
 def dashboard_all(request):
     """Single request returning all dashboard data."""
     cab = _cab_type(request)
-    return JsonResponse({
-        'metrics': analytics.get_metrics(cab),
-        'trips_over_time': analytics.get_trips_over_time(cab),
-        'trips_by_hour': analytics.get_trips_by_hour(cab),
-        'trips_by_weekday': analytics.get_trips_by_weekday(cab),
-        'payment_type': analytics.get_payment_type(cab),
-        'heatmap': analytics.get_heatmap(cab),
-        'demand_predictions': analytics.get_demand_predictions(cab),
-        'cluster_zones': analytics.get_cluster_zones(cab),
-        'duration_predictions': analytics.get_duration_predictions(cab),
-    })
+    approx = _approx(request)
+    timer = perf.RequestTimer()
+    # One data-version read for all panels; on a cache hit only the first panel queries
+    with analytics.request_scope():
+        data = {
+            'metrics': timer.run('metrics', analytics.get_metrics, cab, approx=approx),
+            'trips_over_time': timer.run('trips_over_time', analytics.get_trips_over_time, cab, approx=approx),
+            'trips_by_hour': timer.run('trips_by_hour', analytics.get_trips_by_hour, cab, approx=approx),
+            'trips_by_weekday': timer.run('trips_by_weekday', analytics.get_trips_by_weekday, cab, approx=approx),
+            'payment_type': timer.run('payment_type', analytics.get_payment_type, cab, approx=approx),
+            'heatmap': timer.run('heatmap', analytics.get_heatmap, cab, approx=approx),
+            'demand_predictions': timer.run('demand_predictions', analytics.get_demand_predictions, cab),
+            'cluster_zones': timer.run('cluster_zones', analytics.get_cluster_zones, cab),
+            'duration_predictions': timer.run('duration_predictions', analytics.get_duration_predictions, cab),
+        }
+    return timer.annotate(JsonResponse(data))
+
+
+@require_http_methods(["GET"])
+def perf_stats(request):
+    """Rolling per-panel timing histograms merged across the live worker processes."""
+    return JsonResponse(perf.snapshot())
 
 
 @require_http_methods(["POST"])
 @csrf_exempt
 def upload(request):
+    from .ingest import ingest_file  # pulls in pandas/pyarrow; loaded on first upload
+
     if 'file' not in request.FILES:
         return JsonResponse({'error': 'No file provided'}, status=400)
     file = request.FILES['file']
@@ -93,49 +170,62 @@ def upload(request):
     max_rows = int(request.POST.get('max_rows', 100000))
 
     try:
-        ext = (file.name or '').lower()
-        if ext.endswith('.parquet'):
-            rows = list(parse_parquet(file, cab_type, max_rows))
-        else:
-            rows = list(parse_csv(file, cab_type, max_rows))
-
-        objs = [TaxiTrip(**r) for r in rows]
-        TaxiTrip.objects.bulk_create(objs)
-        return JsonResponse({'uploaded': len(objs), 'cab_type': cab_type})
+        run = ingest_file(file, cab_type, name=file.name or '', origin='upload', max_rows=max_rows)
+    except MemoryBudgetExceeded as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except WriteLockTimeout as e:
+        response = JsonResponse({'error': str(e)}, status=503)
+        response['Retry-After'] = '30'
+        return response
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'uploaded': run.rows_inserted,
+        'duplicates': run.rejected.get('duplicate', 0),
+        'cab_type': cab_type,
+        'ingest': run.as_dict(),
+    })
 
 
 @require_http_methods(["POST"])
 @csrf_exempt
 def load_sample(request):
-    """Load sample parquet files from data/ directory. Deletes non-2025 data first."""
-    TZ = ZoneInfo('America/New_York')
-    year_start = datetime(2025, 1, 1, tzinfo=TZ)
-    year_end = datetime(2026, 1, 1, tzinfo=TZ)
-    TaxiTrip.objects.filter(
-        Q(pickup_datetime__lt=year_start) | Q(pickup_datetime__gte=year_end)
-    ).delete()
+    """Load sample parquet files from data/ directory. Drops non-2025 partitions first."""
+    from .ingest import SAMPLE_FILES, file_sha256, ingest_file
+
+    partitions.drop_outside(202501, 202512)
 
     data_dir = Path(__file__).resolve().parent.parent / 'data'
-    patterns = [
-        ('yellow', 'yellow_tripdata_2025-01.parquet'),
-        ('yellow', 'yellow_tripdata_2025-02.parquet'),
-        ('yellow', 'yellow_tripdata_2025-03.parquet'),
-        ('green', 'green_tripdata_2025-01.parquet'),
-        ('green', 'green_tripdata_2025-02.parquet'),
-        ('green', 'green_tripdata_2025-03.parquet'),
-    ]
     total = 0
-    for cab, fname in patterns:
+    runs = []
+    failed = []
+    for cab, fname in SAMPLE_FILES:
         path = data_dir / fname
         if not path.exists():
             continue
         try:
-            rows = list(parse_parquet(path, cab, max_rows=50000))
-            objs = [TaxiTrip(**r) for r in rows]
-            TaxiTrip.objects.bulk_create(objs)
-            total += len(objs)
-        except Exception:
-            pass
-    return JsonResponse({'loaded': total})
+            run = ingest_file(
+                path, cab, name=fname, origin='load_sample', max_rows=50000, file_hash=file_sha256(path),
+            )
+            total += run.rows_inserted
+            runs.append(run.as_dict())
+        except Exception as e:
+            failed.append({'file': fname, 'error': str(e)})
+    duplicates = sum(r['rejected'].get('duplicate', 0) for r in runs)
+    return JsonResponse({'loaded': total, 'duplicates': duplicates, 'runs': runs, 'failed': failed})
+
+
+@require_http_methods(["GET"])
+def ingest_runs(request):
+    """Recent ingest telemetry, newest first."""
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 200)
+    except ValueError:
+        limit = 20
+    return JsonResponse({'runs': [r.as_dict() for r in IngestRun.objects.all()[:limit]]})
+
+
+@require_http_methods(["GET"])
+def archived_partitions(request):
+    """Cold-tier catalog: months moved from SQLite to Parquet by archive_months."""
+    return JsonResponse({'partitions': [p.as_dict() for p in ArchivedPartition.objects.all()]})
@@ -52,6 +52,21 @@ export async function fetchHeatmap(cabType = 'all') {
   return res.json()
 }
 
+/** Zone × 168 hour-of-week pickups; counts decoded to a typed array, counts[row * 168 + hour] */
+export async function fetchHourOfWeekHeatmap(cabType = 'all') {
+  const res = await fetch(withCabType(`${API_BASE}/heatmap/hour-of-week/`, cabType))
+  if (!res.ok) throw new Error('Failed to fetch hour-of-week heatmap')
+  const data = await res.json()
+  const bytes = Uint8Array.from(atob(data.counts), (c) => c.charCodeAt(0))
+  const view = new DataView(bytes.buffer)
+  const wide = data.dtype === 'uint32'
+  const counts = wide ? new Uint32Array(bytes.length / 4) : new Uint16Array(bytes.length / 2)
+  for (let i = 0; i < counts.length; i++) {
+    counts[i] = wide ? view.getUint32(i * 4, true) : view.getUint16(i * 2, true)
+  }
+  return { ...data, counts }
+}
+
 export async function fetchDemandPredictions(cabType = 'all') {
   const res = await fetch(withCabType(`${API_BASE}/demand-predictions/`, cabType))
   if (!res.ok) throw new Error('Failed to fetch demand predictions')
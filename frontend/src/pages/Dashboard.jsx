@@ -1,6 +1,6 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useMemo } from 'react'
 import Plot from 'react-plotly.js'
-import { fetchDashboardAll } from '../api'
+import { fetchDashboardAll, fetchHourOfWeekHeatmap } from '../api'
 
 const layout = {
   paper_bgcolor: 'rgba(20, 20, 20, 0.98)',
@@ -29,6 +29,87 @@ function ChartCard({ title, subtitle, children }) {
   )
 }
 
+const WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+/** Animated zone × hour-of-week map: one request per cab filter, scrubbing is all client-side */
+function HourOfWeekMap({ cabType, refreshKey }) {
+  const [data, setData] = useState(null)
+  const [hour, setHour] = useState(8)
+  const [playing, setPlaying] = useState(false)
+
+  useEffect(() => {
+    let cancelled = false
+    fetchHourOfWeekHeatmap(cabType)
+      .then((d) => { if (!cancelled) setData(d) })
+      .catch(() => { if (!cancelled) setData(null) })
+    return () => { cancelled = true }
+  }, [cabType, refreshKey])
+
+  useEffect(() => {
+    if (!playing) return undefined
+    const timer = setInterval(() => setHour((h) => (h + 1) % 168), 400)
+    return () => clearInterval(timer)
+  }, [playing])
+
+  const frame = useMemo(() => {
+    if (!data) return null
+    const [rows, cols] = data.shape
+    const z = data.zones
+    const points = { lat: [], lon: [], text: [], count: [] }
+    for (let r = 0; r < rows; r++) {
+      const c = data.counts[r * cols + hour]
+      if (c === 0 || z.lat[r] == null) continue
+      points.lat.push(z.lat[r])
+      points.lon.push(z.lon[r])
+      points.text.push(`${z.zone[r] || 'Zone'}: ${c} pickups`)
+      points.count.push(c)
+    }
+    return points
+  }, [data, hour])
+
+  if (!data || data.total === 0) return null
+  const label = `${WEEKDAYS[Math.floor(hour / 24)]} ${String(hour % 24).padStart(2, '0')}:00`
+
+  return (
+    <ChartCard title="Pickups by Hour of Week" subtitle={`${label} · zone × 168 tensor, scrubbed client-side`}>
+      <div className="map-wrapper">
+        <Plot
+          data={[{
+            lat: frame.lat,
+            lon: frame.lon,
+            text: frame.text,
+            type: 'scattermap',
+            mode: 'markers',
+            marker: {
+              size: frame.count.map((c) => 4 + 10 * Math.sqrt(c / data.max)),
+              color: frame.count,
+              cmin: 0,
+              cmax: data.max,
+              colorscale: [[0, '#0a0a0a'], [0.5, '#005AFF'], [1, '#3d7fff']],
+              showscale: true,
+            },
+          }]}
+          layout={{ ...layout, map: { style: 'open-street-map', center: { lat: 40.73, lon: -73.99 }, zoom: 11 }, height: 340, showlegend: false, uirevision: 'hour-of-week' }}
+          useResizeHandler
+          style={{ width: '100%' }}
+        />
+      </div>
+      <div className="scrubber">
+        <button type="button" className="tab-btn" onClick={() => setPlaying((p) => !p)}>
+          {playing ? 'Pause' : 'Play'}
+        </button>
+        <input
+          type="range"
+          min={0}
+          max={167}
+          value={hour}
+          onChange={(e) => { setPlaying(false); setHour(Number(e.target.value)) }}
+        />
+      </div>
+    </ChartCard>
+  )
+}
+
 export default function Dashboard() {
   const [cabFilter, setCabFilter] = useState('yellow')
   const [metrics, setMetrics] = useState(null)
@@ -318,6 +399,8 @@ export default function Dashboard() {
             </div>
           </ChartCard>
         )}
+
+        <HourOfWeekMap cabType={cabFilter} refreshKey={refreshKey} />
       </div>
     </div>
   )
@@ -0,0 +1,26 @@
+"""
+Gunicorn config for NYC Taxi Dashboard.
+preload_app loads Django in the master; when_ready then warms the heavy imports
+(pandas, pyarrow, scikit-learn) and the zone dimension before workers are forked,
+so every worker shares those pages copy-on-write instead of loading its own copy.
+"""
+import gc
+import os
+
+wsgi_app = 'nyc_taxi_dashboard.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+preload_app = True
+
+
+def when_ready(server):
+    from django.db import connections
+
+    from dashboard import analytics
+
+    zones = analytics.warm_caches()
+    # Forked workers must not inherit the master's SQLite connection
+    connections.close_all()
+    # Keep the collector from touching (and un-sharing) the warmed objects in workers
+    gc.freeze()
+    server.log.info('Warmed shared caches in master (%d zones)', zones)
@@ -62,12 +62,46 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'nyc_taxi_dashboard.wsgi.application'
 
+DB_PATH = Path(os.environ.get('DB_PATH', str(BASE_DIR / 'db.sqlite3'))).resolve()
+# Keep connections open across requests (seconds); pragmas are applied once per connection
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+# Seconds a connection waits on a locked database before raising "database is locked"
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '30'))
+
+# 'default' is the read-write connection (ingest, admin, migrations). 'readonly' opens the
+# same file with mode=ro for analytics; with WAL it keeps reading the last committed
+# snapshot while an ingest transaction is writing.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.environ.get('DB_PATH', str(BASE_DIR / 'db.sqlite3')),
-    }
+        'NAME': str(DB_PATH),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': DB_BUSY_TIMEOUT},
+        # A file, not :memory:, so the readonly alias and writer threads share the test database
+        'TEST': {'NAME': str(DB_PATH.with_name(f'test_{DB_PATH.name}'))},
+    },
+    'readonly': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DB_PATH.as_uri() + '?mode=ro',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': DB_BUSY_TIMEOUT},
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['dashboard.db.ReadOnlyRouter']
+
+# Cold tier: closed months archived out of TaxiTrip as Parquet (manage.py archive_months)
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', str(DB_PATH.parent / 'archive')))
+
+# Each worker's /api/_perf/ timing window (<pid>.pickle), merged by any worker that serves it
+PERF_DIR = Path(os.environ.get('PERF_DIR', str(DB_PATH.parent / 'perf')))
+
+# Per-connection SQLite pragmas (see dashboard/db.py). mmap_size is in bytes; the page
+# cache size is in KiB per connection.
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CACHE_KB = int(os.environ.get('SQLITE_CACHE_KB', str(64 * 1024)))
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -90,4 +124,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # File upload
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+# Uploads larger than this are spooled to a temp file instead of held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
+
+# Peak process RSS allowed while ingesting (e.g. '1G'); empty = unlimited.
+# Batch sizes adapt to stay under it; ingest fails cleanly if it cannot.
+INGEST_MEMORY_LIMIT = os.environ.get('INGEST_MEMORY_LIMIT', '')
+
+# Fraction of trips kept per cab_type × month × hour stratum for approx=1 queries
+APPROX_SAMPLE_FRACTION = float(os.environ.get('APPROX_SAMPLE_FRACTION', '0.01'))